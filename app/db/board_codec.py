@@ -0,0 +1,52 @@
+from app.db.constants import BOARD_SIZE
+from app.db.enums import Colors
+from sqlalchemy.types import TypeDecorator, String
+from typing import List
+import json
+
+# One character per tile, row after row
+COLOR_CHARS = {Colors.red: "r", Colors.blue: "b", Colors.yellow: "y", Colors.green: "g", Colors.none: "n"}
+CHAR_COLORS = {char: color for color, char in COLOR_CHARS.items()}
+VALUE_CHARS = {color.value: char for color, char in COLOR_CHARS.items()}
+
+
+def encode_board(color_distribution: List[list]) -> str:
+    """Pack a board, given as colors or color values, into a 36 character string"""
+    return "".join(COLOR_CHARS[color] if isinstance(color, Colors) else VALUE_CHARS[color]
+                   for row in color_distribution for color in row)
+
+
+def decode_board(packed: str) -> List[List[Colors]]:
+    """Unpack a 36 character string into a board of colors"""
+    colors = [CHAR_COLORS[char] for char in packed]
+    return [colors[i:i + BOARD_SIZE] for i in range(0, len(colors), BOARD_SIZE)]
+
+
+def decode_board_values(packed: str) -> List[List[str]]:
+    """Unpack a 36 character string into a board of color values, as Board.color_distribution keeps it"""
+    return [[color.value for color in row] for row in decode_board(packed)]
+
+
+def is_packed_board(value) -> bool:
+    return isinstance(value, str) and not value.startswith("[")
+
+
+class PackedBoard(TypeDecorator):
+    """
+    Board stored as a 36 character string instead of a JSON list of lists.
+    Boards stored as JSON before are still read.
+    """
+    impl = String(BOARD_SIZE * BOARD_SIZE)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_board(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if not is_packed_board(value):
+            return json.loads(value)
+        return decode_board_values(value)
@@ -1,5 +1,7 @@
 # constants.py
 from enum import Enum
+from app.db.enums import FigureEngine, FigureScanMode
+import os
 
 def generate_valid_moves_mov01():
     valid_moves01 = set()
@@ -132,19 +134,19 @@ def generate_valid_moves_mov07():
 
     return valid_moves07
 
-VALID_MOVES = {
-    "MOV_01": generate_valid_moves_mov01(),
-    "MOV_02": generate_valid_moves_mov02(),
-    "MOV_03": generate_valid_moves_mov03(),
-    "MOV_04": generate_valid_moves_mov04(),
-    "MOV_05": generate_valid_moves_mov05(),
-    "MOV_06": generate_valid_moves_mov06(),
-    "MOV_07": generate_valid_moves_mov07(),
-}
-
 AMOUNT_OF_FIGURES_EASY = 7
 AMOUNT_OF_FIGURES_DIFFICULT = 18
 
+# Engine used by get_all_figures_in_board. Can be overridden with the SWITCHER_FIGURE_ENGINE environment variable.
+FIGURE_ENGINE = FigureEngine(os.getenv("SWITCHER_FIGURE_ENGINE", FigureEngine.incremental.value))
+
+# Figure types looked for when broadcasting the figures in board (SWITCHER_FIGURE_SCAN_MODE):
+# every type, or only the ones in the players' hands.
+FIGURE_SCAN_MODE = FigureScanMode(os.getenv("SWITCHER_FIGURE_SCAN_MODE", FigureScanMode.all.value))
+
+# Amount of analysed boards kept by the figure cache (SWITCHER_FIGURE_CACHE_SIZE). 0 disables the cache.
+FIGURE_CACHE_SIZE = int(os.getenv("SWITCHER_FIGURE_CACHE_SIZE", 1024))
+
 
 
 # Figures (starting from top left, via pathing)
@@ -302,4 +304,133 @@ VALID_PATHS = {
     "fige05": [FIGE5_0, FIGE5_1, FIGE5_2, FIGE5_3],
     "fige06": [FIGE6_0, FIGE6_1],
     "fige07": [FIGE7_0, FIGE7_1, FIGE7_2, FIGE7_3],
-}
\ No newline at end of file
+}
+
+# Compiled placements. Tiles are packed as x * BOARD_SIZE + y (x is the row, y the column).
+
+BOARD_SIZE = 6
+
+MOVEMENT_STEPS = {
+    Movement.UP: (-1, 0),
+    Movement.TUP: (-1, 0),
+    Movement.DOWN: (1, 0),
+    Movement.TDOWN: (1, 0),
+    Movement.LEFT: (0, -1),
+    Movement.TLEFT: (0, -1),
+    Movement.RIGHT: (0, 1),
+    Movement.TRIGHT: (0, 1),
+}
+
+TEMPORAL_MOVEMENTS = (Movement.TUP, Movement.TDOWN, Movement.TLEFT, Movement.TRIGHT)
+
+# Packed tiles that share a side with each tile
+TILE_NEIGHBOURS = [
+    tuple(nx * BOARD_SIZE + ny for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+          if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE)
+    for x in range(BOARD_SIZE) for y in range(BOARD_SIZE)
+]
+
+
+def compile_path(path, x, y):
+    """
+    Walk a path from (x, y) and return the tiles it covers, in the order get_path_valid appends them.
+    Returns None if the path leaves the board.
+    """
+    tiles = []
+    for mov in path:
+        dx, dy = MOVEMENT_STEPS[mov]
+        next_x, next_y = x + dx, y + dy
+        if not (0 <= next_x < BOARD_SIZE and 0 <= next_y < BOARD_SIZE):
+            return None
+        if mov in TEMPORAL_MOVEMENTS:
+            tiles.append(next_x * BOARD_SIZE + next_y)
+        else:
+            tiles.append(x * BOARD_SIZE + y)
+            x, y = next_x, next_y
+    tiles.append(x * BOARD_SIZE + y)
+    return tuple(tiles)
+
+
+def compile_neighbours(tiles):
+    """Tiles that touch the figure without belonging to it"""
+    return frozenset(neighbour for tile in tiles for neighbour in TILE_NEIGHBOURS[tile] if neighbour not in tiles)
+
+
+def compile_valid_paths():
+    """
+    For every path in VALID_PATHS, map each start tile where the path fits in the board
+    to its placement: (tiles, neighbours).
+    """
+    path_placements = {}
+    for paths in VALID_PATHS.values():
+        for path in paths:
+            placements = {}
+            for x in range(BOARD_SIZE):
+                for y in range(BOARD_SIZE):
+                    tiles = compile_path(path, x, y)
+                    if tiles:
+                        placements[x * BOARD_SIZE + y] = (tiles, compile_neighbours(tiles))
+            path_placements[tuple(path)] = placements
+    return path_placements
+
+
+
+def compile_move_targets(valid_moves):
+    """For each packed tile, bitmap of the packed tiles it can be swapped with"""
+    targets = [0] * (BOARD_SIZE * BOARD_SIZE)
+    for x1, y1, x2, y2 in valid_moves:
+        targets[x1 * BOARD_SIZE + y1] |= 1 << (x2 * BOARD_SIZE + y2)
+    return tuple(targets)
+
+
+def compile_tables():
+    """
+    Tables compiled from the movement cards and VALID_PATHS:
+    - VALID_MOVES: (x1, y1, x2, y2) of every legal swap of each card, in both directions.
+    - MOVE_TARGETS: VALID_MOVES as bitmaps, the swap of tile_1 and tile_2 is legal for a card if
+      MOVE_TARGETS[card][tile_1] has bit tile_2.
+    - PATH_PLACEMENTS: placements of every path, see compile_valid_paths.
+    - FIGURE_PLACEMENTS: every legal placement of each figure, in the order rotation -> x -> y.
+    """
+    valid_moves = {
+        "MOV_01": generate_valid_moves_mov01(),
+        "MOV_02": generate_valid_moves_mov02(),
+        "MOV_03": generate_valid_moves_mov03(),
+        "MOV_04": generate_valid_moves_mov04(),
+        "MOV_05": generate_valid_moves_mov05(),
+        "MOV_06": generate_valid_moves_mov06(),
+        "MOV_07": generate_valid_moves_mov07(),
+    }
+    path_placements = compile_valid_paths()
+    return {
+        "VALID_MOVES": valid_moves,
+        "MOVE_TARGETS": {movement_type: compile_move_targets(moves) for movement_type, moves in valid_moves.items()},
+        "PATH_PLACEMENTS": path_placements,
+        "FIGURE_PLACEMENTS": {
+            fig: [placement for path in paths for placement in path_placements[tuple(path)].values()]
+            for fig, paths in VALID_PATHS.items()
+        },
+    }
+
+
+# Compiled once per process, when this module is imported
+VALID_MOVES, MOVE_TARGETS, PATH_PLACEMENTS, FIGURE_PLACEMENTS = map(compile_tables().get, (
+    "VALID_MOVES", "MOVE_TARGETS", "PATH_PLACEMENTS", "FIGURE_PLACEMENTS"))
+
+# Longest sequence of swaps looked for by the hint search, and the seconds it can run for
+# (SWITCHER_HINT_MAX_SWAPS, SWITCHER_HINT_TIME_BUDGET).
+HINT_MAX_SWAPS = int(os.getenv("SWITCHER_HINT_MAX_SWAPS", 3))
+HINT_TIME_BUDGET = float(os.getenv("SWITCHER_HINT_TIME_BUDGET", 0.5))
+
+# Share of the process time the bots can use between all the games (SWITCHER_BOT_CPU_SHARE),
+# and the seconds each bot can spend looking for a figure in its turn (SWITCHER_BOT_TURN_BUDGET).
+BOT_CPU_SHARE = float(os.getenv("SWITCHER_BOT_CPU_SHARE", 0.1))
+BOT_TURN_BUDGET = float(os.getenv("SWITCHER_BOT_TURN_BUDGET", 0.02))
+
+# Threads that run the blocking work of the endpoints (SWITCHER_EXECUTOR_WORKERS), by default as many as
+# ThreadPoolExecutor would use.
+EXECUTOR_WORKERS = int(os.getenv("SWITCHER_EXECUTOR_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+
+# Lazy load audit (SWITCHER_LAZY_LOAD_AUDIT=1): games are loaded with every relationship outside of the game aggregate
+# set to raise, so a lazy load that the eager loading of reload_game doesn't cover fails instead of querying.
+LAZY_LOAD_AUDIT = os.getenv("SWITCHER_LAZY_LOAD_AUDIT", "0") == "1"
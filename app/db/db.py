@@ -1,12 +1,117 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool, StaticPool
+import os
 
-# Conexión a la base de datos SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./switcher.db"
+# Conexión a la base de datos, SQLite por defecto (SWITCHER_DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = os.getenv("SWITCHER_DATABASE_URL", "sqlite:///./switcher.db")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Same database through an asyncio driver (SWITCHER_ASYNC_DATABASE_URL), aiosqlite for SQLite
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_async_url(url: str) -> str:
+    """The url with the asyncio driver of its database, if there is one"""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SWITCHER_ASYNC_DATABASE_URL", get_async_url(SQLALCHEMY_DATABASE_URL))
+
+# Pool of connections (SWITCHER_DB_POOL): queue, null (a new connection per session) or static (a single connection,
+# needed for in-memory SQLite). The queue pool keeps SWITCHER_DB_POOL_SIZE connections, opens up to
+# SWITCHER_DB_MAX_OVERFLOW more under load and waits SWITCHER_DB_POOL_TIMEOUT seconds for a free one.
+DB_POOLS = {"queue": QueuePool, "null": NullPool, "static": StaticPool}
+DB_POOL = os.getenv("SWITCHER_DB_POOL", "queue")
+DB_POOL_SIZE = int(os.getenv("SWITCHER_DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("SWITCHER_DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("SWITCHER_DB_POOL_TIMEOUT", 30))
+
+# Seconds a SQLite connection waits for a lock held by another writer before failing (SWITCHER_DB_BUSY_TIMEOUT)
+DB_BUSY_TIMEOUT = float(os.getenv("SWITCHER_DB_BUSY_TIMEOUT", 5))
+
+# PRAGMAs run on every new SQLite connection (SWITCHER_SQLITE_PROFILE). "default" keeps SQLite's settings,
+# where every commit is synced to disk before it returns.
+# "tuned" is opt-in (SWITCHER_SQLITE_PROFILE=tuned): it uses the write-ahead log, so readers don't block the writer,
+# and only syncs to disk at checkpoints. That trades durability for throughput: the last commits can be lost on a
+# power loss or OS crash, although the database is never corrupted. The WAL journal mode stays in the database file
+# after switching back to "default".
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        # 256 MB memory mapped, 64 MB of page cache
+        "mmap_size": 268435456,
+        "cache_size": -65536,
+    },
+}
+SQLITE_PROFILE = os.getenv("SWITCHER_SQLITE_PROFILE", "default")
+
+
+def get_engine_options(url: str, pool: str, pool_size: int, max_overflow: int, pool_timeout: float,
+                       busy_timeout: float, asynchronous: bool = False) -> dict:
+    """Keyword arguments of create_engine for the url and pool"""
+    pool_class = DB_POOLS[pool]
+    if asynchronous and pool_class is QueuePool:
+        pool_class = AsyncAdaptedQueuePool
+
+    options = {"poolclass": pool_class}
+    if pool == "queue":
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False, "timeout": busy_timeout}
+    return options
+
+
+def set_sqlite_profile(engine: Engine, sqlite_profile: str):
+    """Run the PRAGMAs of the profile on every new connection of the engine, if it is a SQLite database"""
+    pragmas = SQLITE_PROFILES[sqlite_profile] if engine.dialect.name == "sqlite" else {}
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, pool: str = DB_POOL, pool_size: int = DB_POOL_SIZE,
+                     max_overflow: int = DB_MAX_OVERFLOW, pool_timeout: float = DB_POOL_TIMEOUT,
+                     busy_timeout: float = DB_BUSY_TIMEOUT, sqlite_profile: str = SQLITE_PROFILE) -> Engine:
+    """Engine for the url with the given pool, and the SQLite profile if it is a SQLite database"""
+    engine = create_engine(url, **get_engine_options(url, pool, pool_size, max_overflow, pool_timeout, busy_timeout))
+    set_sqlite_profile(engine, sqlite_profile)
+    return engine
+
+
+def create_async_db_engine(url: str = SQLALCHEMY_ASYNC_DATABASE_URL, pool: str = DB_POOL, pool_size: int = DB_POOL_SIZE,
+                           max_overflow: int = DB_MAX_OVERFLOW, pool_timeout: float = DB_POOL_TIMEOUT,
+                           busy_timeout: float = DB_BUSY_TIMEOUT, sqlite_profile: str = SQLITE_PROFILE) -> AsyncEngine:
+    """Same as create_db_engine, for an asyncio driver. Queries are awaited instead of blocking the event loop."""
+    engine = create_async_engine(url, **get_engine_options(url, pool, pool_size, max_overflow, pool_timeout, busy_timeout,
+                                                           asynchronous=True))
+    set_sqlite_profile(engine.sync_engine, sqlite_profile)
+    return engine
+
+
+engine = create_db_engine()
+
+# Endpoints commit once, after the services changed the loaded objects. The objects keep that state after the
+# commit instead of loading it back, and broadcasts can still read them once the session is closed.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Sessions for the code that runs on the event loop. Loaded objects keep their attributes after commit and close,
+# since they can't lazy load them outside of the session.
+async_engine = create_async_db_engine()
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
 
 Base = declarative_base()
 
@@ -15,4 +120,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
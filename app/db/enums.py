@@ -53,3 +53,13 @@ class Colors(Enum):
     yellow = "yellow"
     green = "green"
     none = "none"
+
+class FigureEngine(Enum):
+    bitboard = "bitboard"
+    components = "components"
+    incremental = "incremental"
+    trie = "trie"
+
+class FigureScanMode(Enum):
+    all = "all"
+    in_hand = "in hand"
@@ -10,7 +10,7 @@ from app.db.db import get_db
 from app.db.enums import GameStatus
 from typing import List
 from app.schemas.game_schemas import GameSchemaOut
-from app.services.game_services import convert_game_to_schema
+from app.services.game_services import convert_game_to_schema, get_game_load_options, reload_game
 
 
 def check_name(game: Annotated[GameSchemaIn, Body()]):
@@ -33,7 +33,12 @@ def get_player(id_player: int, db: Session = Depends(get_db)) -> Player:
 
 
 def get_game(id_game: int, db: Session = Depends(get_db)) -> Game:
-    """dependency to get a game by ID"""
+    """
+    dependency to get a game by ID.
+    It stays on the sync session the endpoint changes and commits the game with, FastAPI runs it in its threadpool.
+    Only the game is read here: the endpoints load the whole aggregate with reload_game once they hold the game
+    in the executor, as other work of the game can commit while they wait for it.
+    """
     game = db.query(Game).filter(Game.id == id_game).first()
 
     if not game:
@@ -53,6 +58,6 @@ def get_game_status(status: Optional[str] = Query(None, description="Filtra jueg
 
 def get_game_list() -> List[GameSchemaOut]:
     db = next(get_db())
-    games = db.query(Game).filter(Game.status == GameStatus.waiting.value).all()
+    games = db.query(Game).options(*get_game_load_options()).filter(Game.status == GameStatus.waiting.value).all()
     games = list(map(convert_game_to_schema, games))
     return games
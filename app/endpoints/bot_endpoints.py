@@ -0,0 +1,141 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.orm import Session
+from app.db.db import get_db, SessionLocal
+from app.db.enums import GameStatus
+from app.models.game_models import Game
+from app.models.player_models import Player
+from app.dependencies.dependencies import get_game
+from app.schemas.figure_schema import FigureToDiscardSchema
+from app.schemas.movement_schema import MovementSchema
+from app.schemas.movement_cards_schema import MovementCardSchema
+from app.schemas.figure_schema import HintSchema
+from app.services.game_services import is_player_host, convert_game_to_schema, get_game_load_options, reload_game
+from app.services.bot_services import bot_scheduler, create_bot_players, plan_bot_turn, register_bots
+from app.endpoints.game_endpoints import auth_scheme, add_movement_sync, discard_figure_card_sync, finish_turn_sync
+from app.endpoints.websocket_endpoints import game_connection_managers
+from app.services.executor_services import game_executor, create_task, call_soon
+from typing import Callable, Optional, Tuple
+import logging
+import time
+
+
+router = APIRouter(
+    prefix="/games",
+    tags=["Bots"]
+)
+
+
+@router.put("/{id_game}/bots", summary="Fill the empty seats with bots")
+async def add_bots(player: Player = Depends(auth_scheme), game: Game = Depends(get_game), db: Session = Depends(get_db)):
+    return await game_executor.run(game.id, add_bots_sync, player, game, db)
+
+
+def add_bots_sync(player: Player, game: Game, db: Session):
+    game = reload_game(game)
+
+    if game.status is not GameStatus.waiting:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="La partida ya comenzo")
+
+    if not is_player_host(player, game):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Solo el host puede agregar bots")
+
+    bots = create_bot_players(game, db)
+
+    db.commit()
+
+    for bot in bots:
+        create_task(game_connection_managers[game.id].broadcast_connection(
+            game=game, player_id=bot.id, player_name=bot.name))
+
+    return {"message": f"Se agregaron {len(bots)} bots a la partida", "game": convert_game_to_schema(game)}
+
+
+def plan_bot_turn_sync(game_id: int) -> Optional[Tuple[int, HintSchema, float]]:
+    """Id of the bot in turn, its plan and the CPU seconds the plan took, or None if a human player is in turn"""
+    db = SessionLocal()
+    try:
+        game = db.query(Game).options(*get_game_load_options()).filter(Game.id == game_id).first()
+        if not game or game.status is not GameStatus.in_game:
+            call_soon(bot_scheduler.remove_game, game_id)
+            return None
+
+        bot: Player = game.players[game.player_turn]
+        if not bot_scheduler.is_bot(game_id, bot.id):
+            return None
+
+        start = time.thread_time()
+        plan = plan_bot_turn(game, bot)
+        return bot.id, plan, time.thread_time() - start
+    finally:
+        db.close()
+
+
+def play_bot_action_sync(game_id: int, bot_id: int, action: Callable, **kwargs):
+    """
+    Run the work of an endpoint for the bot with a session of its own, like the request of a human player.
+    Nothing is done once the game is over.
+    """
+    db = SessionLocal()
+    try:
+        game = db.query(Game).filter(Game.id == game_id).first()
+        if not game or game.status is not GameStatus.in_game:
+            call_soon(bot_scheduler.remove_game, game_id)
+            return None
+
+        return action(player=db.get(Player, bot_id), game=game, db=db, **kwargs)
+    finally:
+        db.close()
+
+
+async def play_bot_turn(game_id: int) -> Optional[float]:
+    """
+    Play the turn of the bot in turn, if any, through the same work the endpoints of the human players run:
+    the swaps of its plan, the discard of the figure it forms, and the end of the turn.
+    Each step waits for the game in the executor, so the requests of the humans can be served in between.
+    Returns the CPU seconds spent planning the turn, which the scheduler budgets.
+    """
+    turn = await game_executor.run(game_id, plan_bot_turn_sync, game_id)
+    if not turn:
+        return None
+    bot_id, plan, used = turn
+
+    if plan.figure:
+        try:
+            for movement in plan.movements:
+                await game_executor.run(game_id, play_bot_action_sync, game_id, bot_id, add_movement_sync,
+                                        movement=MovementSchema(
+                                            movement_card=MovementCardSchema(movement_type=movement.movement_type,
+                                                                             associated_player=bot_id, in_hand=True),
+                                            piece_1_coordinates=movement.piece_1_coordinates,
+                                            piece_2_coordinates=movement.piece_2_coordinates))
+
+            fig = plan.figure.fig.value[0]
+            tile = plan.figure.tiles[0]
+            await game_executor.run(game_id, play_bot_action_sync, game_id, bot_id, discard_figure_card_sync,
+                                    figure_to_discard=FigureToDiscardSchema(
+                                        figure_card=fig, associated_player=bot_id, figure_board=fig,
+                                        clicked_x=tile.x, clicked_y=tile.y))
+        except HTTPException as error:
+            logging.warning(f"Bot {bot_id} could not follow its plan in game {game_id}: {error.detail}")
+
+    await game_executor.run(game_id, play_bot_action_sync, game_id, bot_id, finish_turn_sync)
+    return used
+
+
+def resume_bots_sync():
+    db = SessionLocal()
+    try:
+        for game_id in register_bots(db):
+            call_soon(bot_scheduler.notify, game_id)
+    finally:
+        db.close()
+
+
+async def resume_bots():
+    """Register the bots saved in the database after a restart, and let the ones in turn play"""
+    await game_executor.run(None, resume_bots_sync)
+
+
+bot_scheduler.play_turn = play_bot_turn
@@ -1,16 +1,17 @@
 from app.schemas.game_schemas import GameSchemaIn, GameSchemaOut
 from app.schemas.figure_card_schema import FigureCardSchema
 from app.models.figure_card_model import FigureCard
-from app.schemas.figure_schema import FigureInBoardSchema, FigureToDiscardSchema
-from app.schemas.movement_schema import MovementSchema
-from fastapi import APIRouter, HTTPException, Depends, status, Response
+from app.schemas.figure_schema import FigureInBoardSchema, FigureToDiscardSchema, SwapPreviewSchema, HintSchema
+from app.schemas.movement_schema import MovementSchema, LegalMovementSchema, Coordinate
+from fastapi import APIRouter, HTTPException, Depends, status, Response, Query
 from sqlalchemy.orm import Session
 from app.db.db import get_db
 from app.db.enums import GameStatus, Colors
+from app.db.constants import BOARD_SIZE
 from app.schemas.player_schemas import PlayerGameSchemaOut
 from app.models.game_models import Game
 from app.models.player_models import Player
-from app.dependencies.dependencies import get_game, get_player, check_name, get_game_status
+from app.dependencies.dependencies import get_game, check_name, get_game_status
 from app.services.game_services import (search_player_in_game, is_player_host, remove_player_from_game,
                                         convert_game_to_schema, validate_game_capacity, add_player_to_game,
                                         validate_players_amount,  random_initial_turn,
@@ -18,17 +19,22 @@ from app.services.game_services import (search_player_in_game, is_player_host, r
                                         deal_figure_cards_to_player, clear_all_cards, end_game,
                                         has_partial_movement, remove_last_partial_movement, remove_all_partial_movements,
                                         calculate_partial_board, has_figure_card, erase_figure_card, get_real_card,
-                                        get_real_figure_in_board, serialize_board, get_player_by_id, block_player, unlock_remaining_card)
+                                        get_real_figure_in_board, serialize_board, get_player_by_id, block_player, unlock_remaining_card,
+                                        get_game_load_options, reload_game)
 from app.models.board_models import Board
 from app.dependencies.dependencies import get_game, check_name, get_game_status
 from app.services.movement_services import (deal_initial_movement_cards, deal_movement_cards,
                                             discard_movement_card, validate_movement,
-                                            make_partial_move, reassign_all_movement_cards, delete_movement_cards_not_in_hand)
-from app.services.figure_services import (get_figure_in_board)
+                                            make_partial_move, reassign_all_movement_cards, delete_movement_cards_not_in_hand,
+                                            get_legal_movements)
+from app.services.figure_services import (get_figure_at_tile)
+from app.services.preview_services import get_swap_previews, get_movement_types_in_hand
+from app.services.hint_services import get_hint, get_hint_figure_types
+from app.services.bot_services import bot_scheduler
 from app.endpoints.websocket_endpoints import game_connection_managers
 from app.services.auth_services import CustomHTTPBearer
+from app.services.executor_services import game_executor, create_task, call_soon
 from typing import List, Optional
-import asyncio
 import json
 import logging
 
@@ -44,6 +50,10 @@ auth_scheme = CustomHTTPBearer()
 
 @router.post("/", dependencies=[Depends(check_name)], response_model=GameSchemaOut)
 async def create_game(game: GameSchemaIn, player: Player = Depends(auth_scheme), db: Session = Depends(get_db)):
+    return await game_executor.run(None, create_game_sync, game, player, db)
+
+
+def create_game_sync(game: GameSchemaIn, player: Player, db: Session):
     new_game = Game(
         name=game.name,
         player_amount=game.player_amount,
@@ -56,7 +66,6 @@ async def create_game(game: GameSchemaIn, player: Player = Depends(auth_scheme),
 
     db.add(new_game)
     db.commit()
-    db.refresh(new_game)
 
     return new_game
 
@@ -71,6 +80,12 @@ async def join_game(game: Game = Depends(get_game), player: Player = Depends(aut
 
     - `id_player`: The ID of the player to join the game.
     """
+    return await game_executor.run(game.id, join_game_sync, game, player, db)
+
+
+def join_game_sync(game: Game, player: Player, db: Session):
+    game = reload_game(game)
+
     player = db.merge(player)
 
     validate_game_capacity(game)
@@ -78,10 +93,8 @@ async def join_game(game: Game = Depends(get_game), player: Player = Depends(aut
     add_player_to_game(game, player, db)
 
     db.commit()
-    db.refresh(game)
-    db.refresh(player)
 
-    asyncio.create_task(game_connection_managers[game.id].broadcast_connection(
+    create_task(game_connection_managers[game.id].broadcast_connection(
         game=game, player_id=player.id, player_name=player.name))
 
     game_out = convert_game_to_schema(game)
@@ -91,6 +104,12 @@ async def join_game(game: Game = Depends(get_game), player: Player = Depends(aut
 
 @router.put("/{id_game}/quit")
 async def quit_game(player: Player = Depends(auth_scheme), game: Game = Depends(get_game), db: Session = Depends(get_db)):
+    return await game_executor.run(game.id, quit_game_sync, player, game, db)
+
+
+def quit_game_sync(player: Player, game: Game, db: Session):
+    game = reload_game(game)
+
     player = db.merge(player)
 
     search_player_in_game(player, game)
@@ -105,27 +124,30 @@ async def quit_game(player: Player = Depends(auth_scheme), game: Game = Depends(
 
     player.blocked = False
 
-    db.commit()
-    db.refresh(game)
-    db.refresh(player)
+    winner = game.players[0] if is_single_player_victory(game) else None
 
-    asyncio.create_task(game_connection_managers[game.id].broadcast_disconnection(
-        game=game, player_id=player.id, player_name=player.name))
+    if winner:
+        end_game(game, db)
 
-    if is_single_player_victory(game):
-        asyncio.create_task(game_connection_managers[game.id].broadcast_game_won(
-            game, game.players[0]))
+    db.commit()
 
-        end_game(game, db)
+    create_task(game_connection_managers[game.id].broadcast_disconnection(
+        game=game, player_id=player.id, player_name=player.name))
 
-        db.commit()
-        db.refresh(player)
+    if winner:
+        create_task(game_connection_managers[game.id].broadcast_game_won(game, winner))
 
     return {"message": f"{player.name} abandono la partida", "game": convert_game_to_schema(game)}
 
 
 @router.put("/{id_game}/start", summary="Start a game", dependencies=[Depends(auth_scheme)])
 async def start_game(game: Game = Depends(get_game), db: Session = Depends(get_db)):
+    return await game_executor.run(game.id, start_game_sync, game, db)
+
+
+def start_game_sync(game: Game, db: Session):
+    game = reload_game(game)
+
     validate_players_amount(game)
 
     random_initial_turn(game)
@@ -139,30 +161,36 @@ async def start_game(game: Game = Depends(get_game), db: Session = Depends(get_d
     for player in game.players:
         deal_figure_cards_to_player(player, db)
 
-    board = Board(game.id)
-    db.add(board)
+    game.board = Board(game.id)
     db.commit()
-    db.refresh(board)
 
     game_out = convert_game_to_schema(game)
 
     player_name = game.players[game.player_turn].name
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_game_start(game, player_name))
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_board(game))
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_figures_in_board(game)
     )
 
+    call_soon(bot_scheduler.notify, game.id)
+
     return {"message": "La partida ha comenzado", "game": game_out}
 
 
 @router.put("/{id_game}/finish-turn", summary="Finish a turn")
 async def finish_turn(player: Player = Depends(auth_scheme), game: Game = Depends(get_game), db: Session = Depends(get_db)):
+    return await game_executor.run(game.id, finish_turn_sync, player, game, db)
+
+
+def finish_turn_sync(player: Player, game: Game, db: Session):
+    game = reload_game(game)
+
     if game.status is not GameStatus.in_game:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="El juego debe estar comenzado")
@@ -184,29 +212,35 @@ async def finish_turn(player: Player = Depends(auth_scheme), game: Game = Depend
     remove_all_partial_movements(player_turn_obj, db)
 
     db.commit()
-    db.refresh(game)
-    db.refresh(player_turn_obj)
 
     game_out = convert_game_to_schema(game)
 
     # Actualizamos el tablero y el juego
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_board(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_figures_in_board(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_game(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_finish_turn(game, game.players[game.player_turn].name))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_moves_in_board(game)
     )
 
+    call_soon(bot_scheduler.notify, game.id)
+
     return {"message": "Turno finalizado", "game": game_out}
 
 
 @router.put("/{id_game}/movement/back", summary="Cancel movement")
 async def undo_movement(player: Player = Depends(auth_scheme), game: Game = Depends(get_game), db: Session = Depends(get_db)):
+    return await game_executor.run(game.id, undo_movement_sync, player, game, db)
+
+
+def undo_movement_sync(player: Player, game: Game, db: Session):
+    game = reload_game(game)
+
     player_turn_obj: Player = game.players[game.player_turn]
 
     if player.id != player_turn_obj.id:
@@ -215,16 +249,17 @@ async def undo_movement(player: Player = Depends(auth_scheme), game: Game = Depe
 
     if has_partial_movement(player_turn_obj):
 
-        if remove_last_partial_movement(player_turn_obj, db):
+        if remove_last_partial_movement(game, player_turn_obj, db):
+            db.commit()
 
             # Una vez actualizada la base de datos, actualizamos el tablero y el juego
-            asyncio.create_task(
+            create_task(
                 game_connection_managers[game.id].broadcast_partial_board(game))
-            asyncio.create_task(
+            create_task(
                 game_connection_managers[game.id].broadcast_figures_in_board(game))
-            asyncio.create_task(
+            create_task(
                 game_connection_managers[game.id].broadcast_game(game))
-            asyncio.create_task(
+            create_task(
                 game_connection_managers[game.id].broadcast_partial_moves_in_board(game)
                 )
 
@@ -237,6 +272,12 @@ async def undo_movement(player: Player = Depends(auth_scheme), game: Game = Depe
 @router.put("/{id_game}/movement/add", summary="Add a movement to the game")
 async def add_movement(movement: MovementSchema, player: Player = Depends(auth_scheme), game: Game = Depends(get_game), db: Session = Depends(get_db)):
 
+    return await game_executor.run(game.id, add_movement_sync, movement, player, game, db)
+
+
+def add_movement_sync(movement: MovementSchema, player: Player, game: Game, db: Session):
+    game = reload_game(game)
+
     if game.status is not GameStatus.in_game:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="El juego debe estar comenzado")
@@ -249,26 +290,113 @@ async def add_movement(movement: MovementSchema, player: Player = Depends(auth_s
 
     validate_movement(movement, game)
 
-    discard_movement_card(movement, player, db)
+    discard_movement_card(movement, player_turn_obj, db)
 
-    make_partial_move(movement=movement, player=player, db=db)
+    make_partial_move(movement=movement, player=player_turn_obj, db=db)
 
     db.commit()
-    db.refresh(player_turn_obj)
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_board(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_figures_in_board(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_game(game))
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_moves_in_board(game)
     )
 
     return {"message": f"Movimiento realizado por {player.name}"}
 
 
+@router.get("/{id_game}/movement/preview", response_model=List[SwapPreviewSchema], summary="Preview the swaps of the movement cards in hand")
+async def preview_movements(player: Player = Depends(auth_scheme), game: Game = Depends(get_game)):
+    """
+    Every swap the player can make with the movement cards in hand, and the figures it would form or destroy
+    in the current partial board. Nothing is written, so clients can try moves without adding and undoing them.
+    """
+    return await game_executor.run(game.id, preview_movements_sync, player, game)
+
+
+def preview_movements_sync(player: Player, game: Game):
+    game = reload_game(game)
+
+    if game.status is not GameStatus.in_game:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="El juego debe estar comenzado")
+
+    player_turn_obj: Player = game.players[game.player_turn]
+
+    if player.id != player_turn_obj.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Es necesario que sea tu turno para poder realizar un movimiento")
+
+    board = calculate_partial_board(game)
+
+    return get_swap_previews(board=board, movement_types=get_movement_types_in_hand(player_turn_obj),
+                             f_color=game.forbidden_color)
+
+
+@router.get("/{id_game}/movement/legal", response_model=List[LegalMovementSchema], summary="Get the legal swaps of the movement cards in hand")
+async def get_legal_movements_in_hand(x: Optional[int] = Query(None, ge=0, lt=BOARD_SIZE), y: Optional[int] = Query(None, ge=0, lt=BOARD_SIZE),
+                                      player: Player = Depends(auth_scheme), game: Game = Depends(get_game)):
+    """
+    Tiles each tile can be swapped with, for every movement card in the player's hand.
+    With x and y, only the swaps that start from that tile are returned.
+    """
+    return await game_executor.run(game.id, get_legal_movements_in_hand_sync, x, y, player, game)
+
+
+def get_legal_movements_in_hand_sync(x: Optional[int], y: Optional[int], player: Player, game: Game):
+    game = reload_game(game)
+
+    if game.status is not GameStatus.in_game:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="El juego debe estar comenzado")
+
+    if (x is None) != (y is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Es necesario indicar ambas coordenadas de la ficha")
+
+    player_in_game = get_player_by_id(player.id, game)
+
+    tile = None if x is None else Coordinate(x=x, y=y)
+
+    return get_legal_movements(get_movement_types_in_hand(player_in_game), tile)
+
+
+@router.get("/{id_game}/hint", response_model=HintSchema, summary="Get the shortest way to form a figure in hand")
+async def get_figure_hint(player: Player = Depends(auth_scheme), game: Game = Depends(get_game)):
+    """
+    Shortest sequence of swaps, with the movement cards in hand, that forms one of the player's figure cards
+    in the current partial board. The search runs in a worker thread with a time budget, so it never blocks the game.
+    """
+    hint_arguments = await game_executor.run(game.id, get_figure_hint_arguments, player, game)
+
+    # Only reads the board, so it doesn't wait for the rest of the work of the game
+    return await game_executor.run(None, get_hint, **hint_arguments)
+
+
+def get_figure_hint_arguments(player: Player, game: Game) -> dict:
+    game = reload_game(game)
+
+    if game.status is not GameStatus.in_game:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="El juego debe estar comenzado")
+
+    player_turn_obj: Player = game.players[game.player_turn]
+
+    if player.id != player_turn_obj.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Es necesario que sea tu turno para pedir una pista")
+
+    board = calculate_partial_board(game)
+    movement_types = [card.movement_type for card in player_turn_obj.movement_cards if card.in_hand]
+
+    return {"board": board, "movement_types": movement_types,
+            "fig_types": get_hint_figure_types(player_turn_obj), "f_color": game.forbidden_color}
+
+
 @router.get("/", response_model=List[GameSchemaOut], summary="Get games filtered by status", dependencies=[Depends(auth_scheme)])
 def get_games(
     # Se utiliza la función modularizada
@@ -285,9 +413,9 @@ def get_games(
     - A list of games that match the given status, or all games if no status is provided.
     """
     if status:
-        games = db.query(Game).filter(Game.status == status).all()
+        games = db.query(Game).options(*get_game_load_options()).filter(Game.status == status).all()
     else:
-        games = db.query(Game).all()
+        games = db.query(Game).options(*get_game_load_options()).all()
 
     return games
 
@@ -295,6 +423,12 @@ def get_games(
 @router.put("/{id_game}/figure/discard", summary="Discard a figure card")
 async def discard_figure_card(figure_to_discard: FigureToDiscardSchema, player: Player = Depends(auth_scheme), db: Session = Depends(get_db), game: Game = Depends(get_game)):
 
+    return await game_executor.run(game.id, discard_figure_card_sync, figure_to_discard, player, db, game)
+
+
+def discard_figure_card_sync(figure_to_discard: FigureToDiscardSchema, player: Player, db: Session, game: Game):
+    game = reload_game(game)
+
     player_turn_obj: Player = game.players[game.player_turn]
     board = calculate_partial_board(game)
 
@@ -320,9 +454,11 @@ async def discard_figure_card(figure_to_discard: FigureToDiscardSchema, player:
                             detail="La carta figura no esta en la mano del jugador")
 
     figure_type = figure_card.type.value
-    # Verificar que la carta figura esta formada en el tablero
+    # Verificar que la carta figura esta formada en el tablero, en la casilla elegida
 
-    if figure_in_board.fig not in [x.fig for x in get_figure_in_board(board=board, figure_type=figure_type, f_color=game.forbidden_color)]:
+    figure_at_tile = get_figure_at_tile(figure_type=figure_type, board=board, x=figure_to_discard.clicked_x,
+                                        y=figure_to_discard.clicked_y, f_color=game.forbidden_color)
+    if not figure_at_tile or figure_at_tile.fig != figure_in_board.fig:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="La carta figura no esta formada en el tablero")
 
@@ -332,9 +468,6 @@ async def discard_figure_card(figure_to_discard: FigureToDiscardSchema, player:
     # Actualizar el color prohibido
     game.forbidden_color = figure_color
 
-    asyncio.create_task(
-        game_connection_managers[game.id].broadcast_board(game))
-
     # Setear movimientos como finales
     for movement in player_turn_obj.movements:
         movement.final_movement = True
@@ -344,9 +477,6 @@ async def discard_figure_card(figure_to_discard: FigureToDiscardSchema, player:
     # Registrar la carta figura en el descarte
     erase_figure_card(player=player_turn_obj, figure=figure_card, db=db)
 
-    db.commit()
-    db.refresh(player_turn_obj)
-
     cards_in_hand = [
         card for card in player_turn_obj.figure_cards if card.in_hand]
 
@@ -356,38 +486,44 @@ async def discard_figure_card(figure_to_discard: FigureToDiscardSchema, player:
     if not len(cards_in_hand) and player_turn_obj.blocked:
         player_turn_obj.blocked = False
 
+    victory = is_out_of_figure_cards_victory(player_turn_obj)
+
+    if victory:
+        end_game(game, db)
+
     db.commit()
-    db.refresh(game)
-    db.refresh(player_turn_obj)
 
-    asyncio.create_task(
+    create_task(
+        game_connection_managers[game.id].broadcast_board(game))
+
+    create_task(
         game_connection_managers[game.id].broadcast_game(game))
 
     # El color prohibido ha cambiado: reenviar todas las figuras formadas en el tablero.
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_figures_in_board(game)
     )
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_moves_in_board(game) #
     )
 
-    if is_out_of_figure_cards_victory(player_turn_obj):
-
-        asyncio.create_task(game_connection_managers[game.id].broadcast_game_won(
+    if victory:
+        create_task(game_connection_managers[game.id].broadcast_game_won(
             game, player_turn_obj))
 
-        end_game(game, db)
-
-    db.commit()
-    db.refresh(player_turn_obj)
-
     return {"message": "Carta figura descartada con exito"}
 
 
 @router.put("/{id_game}/figure/block", summary="Block a figure card")
 async def block_figure_card(figure_to_block: FigureToDiscardSchema, player: Player = Depends(auth_scheme), db: Session = Depends(get_db), game: Game = Depends(get_game)):
 
+    return await game_executor.run(game.id, block_figure_card_sync, figure_to_block, player, db, game)
+
+
+def block_figure_card_sync(figure_to_block: FigureToDiscardSchema, player: Player, db: Session, game: Game):
+    game = reload_game(game)
+
     player_turn_obj: Player = game.players[game.player_turn]
 
     if player.id != player_turn_obj.id:
@@ -426,8 +562,10 @@ async def block_figure_card(figure_to_block: FigureToDiscardSchema, player: Play
 
     figure_type = figure_card.type.value
 
-    # Verificar que la carta figura esta formada en el tablero
-    if figure_in_board.fig not in [x.fig for x in get_figure_in_board(board=board, figure_type=figure_type, f_color=game.forbidden_color)]:
+    # Verificar que la carta figura esta formada en el tablero, en la casilla elegida
+    figure_at_tile = get_figure_at_tile(figure_type=figure_type, board=board, x=figure_to_block.clicked_x,
+                                        y=figure_to_block.clicked_y, f_color=game.forbidden_color)
+    if not figure_at_tile or figure_at_tile.fig != figure_in_board.fig:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="La carta figura no esta formada en el tablero")
 
@@ -437,9 +575,6 @@ async def block_figure_card(figure_to_block: FigureToDiscardSchema, player: Play
     # Actualizar el color prohibido
     game.forbidden_color = figure_color
 
-    asyncio.create_task(
-        game_connection_managers[game.id].broadcast_board(game))
-
     # Setear movimientos como finales
     for movement in player_turn_obj.movements:
         movement.final_movement = True
@@ -449,13 +584,18 @@ async def block_figure_card(figure_to_block: FigureToDiscardSchema, player: Play
     # Actually bloquear al jugador
     block_player(figure_card, player_to_block, db)
 
-    asyncio.create_task(
+    db.commit()
+
+    create_task(
+        game_connection_managers[game.id].broadcast_board(game))
+
+    create_task(
         game_connection_managers[game.id].broadcast_game(game))
 
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_figures_in_board(game)
     )
-    asyncio.create_task(
+    create_task(
         game_connection_managers[game.id].broadcast_partial_moves_in_board(game) #
     )
 
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from app.services.executor_services import game_executor
+from app.services.figure_services import figure_cache
+from app.services.preview_services import swap_preview_cache
+
+
+router = APIRouter(
+    tags=["Metrics"]
+)
+
+
+@router.get("/metrics", summary="Executor and cache metrics")
+def get_metrics():
+    """
+    Threads of the game executor and work running and waiting in it, with the hits of the figure caches.
+    `max_game_queue` is the most work submitted for a single game and not finished yet.
+    """
+    return {"executor": game_executor.info(),
+            "figure_cache": figure_cache.info(),
+            "swap_preview_cache": swap_preview_cache.info()}
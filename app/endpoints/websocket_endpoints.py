@@ -5,6 +5,8 @@ from app.db.db import get_db
 from app.models.game_models import Game
 from app.services.websocket_services import GameManager, GameListManager
 from app.dependencies.dependencies import get_game
+from app.services.game_services import reload_game
+from app.services.executor_services import create_task, game_executor
 from asyncio import AbstractEventLoop
 import asyncio
 import logging
@@ -31,25 +33,30 @@ def get_or_create_event_loop():
         return loop
 
 
+def schedule_game_list_broadcast(coro):
+    """
+    Flushes run in the game executor, where the broadcast is left for the loop of the request.
+    Anywhere else without a running loop, it runs on a loop of its own.
+    """
+    try:
+        create_task(coro)
+    except RuntimeError:
+        asyncio.run_coroutine_threadsafe(coro, get_or_create_event_loop())
+
+
 @event.listens_for(Game, 'after_insert')
 def handle_creation(mapper, connection, target: Game):
-    loop = get_or_create_event_loop()
-    asyncio.run_coroutine_threadsafe(
-        game_list_manager.broadcast_game("game added", target), loop)
+    schedule_game_list_broadcast(game_list_manager.broadcast_game("game added", target))
 
 
 @event.listens_for(Game, 'after_delete')
 def handle_deletion(mapper, connection, target: Game):
-    loop = get_or_create_event_loop()
-    asyncio.run_coroutine_threadsafe(
-        game_list_manager.broadcast_game("game deleted", target), loop)
+    schedule_game_list_broadcast(game_list_manager.broadcast_game("game deleted", target))
 
 
 @event.listens_for(Game, 'after_update')
 def handle_change(mapper, connection, target: Game):
-    loop = get_or_create_event_loop()
-    asyncio.run_coroutine_threadsafe(
-        game_list_manager.broadcast_game("game updated", target), loop)
+    schedule_game_list_broadcast(game_list_manager.broadcast_game("game updated", target))
 
 
 @router.websocket("/ws/games")
@@ -66,18 +73,25 @@ async def list(websocket: WebSocket):
         game_list_manager.disconnect(websocket)
 
 
+def build_game_broadcast(game_manager: GameManager, game_id: int, db: Session):
+    """Event with the game for a new connection, loaded in the executor like the work of the endpoints"""
+    return game_manager.broadcast_game(reload_game(get_game(game_id, db)))
+
+
 @router.websocket("/ws/games/{game_id}")
-async def game(websocket: WebSocket, game_id: int, db: Session = Depends(get_db)):
+async def game(websocket: WebSocket, game_id: int, compact: bool = False, db: Session = Depends(get_db)):
+    """
+    Game events. With ?compact=true, boards are sent packed as a 36 character string, one character per tile
+    (r, b, y, g or n) row after row.
+    """
     game_manager = game_connection_managers.get(game_id)
     if not game_manager:
         game_manager = GameManager()
         game_connection_managers[game_id] = game_manager
 
-    await game_manager.connect(websocket)
-
-    game = get_game(game_id, db)
+    await game_manager.connect(websocket, compact=compact)
 
-    await game_manager.broadcast_game(game)
+    await (await game_executor.run(game_id, build_game_broadcast, game_manager, game_id, db))
 
     try:
         while True:
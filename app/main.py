@@ -1,20 +1,32 @@
 from fastapi import FastAPI
-from app.endpoints import game_endpoints, player_endpoints, websocket_endpoints
+from app.endpoints import game_endpoints, player_endpoints, websocket_endpoints, bot_endpoints, metrics_endpoints
 from app.db.db import Base, engine
 import logging
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 
 logging.basicConfig(level=logging.DEBUG)
 
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The scheduler keeps the bots in memory: register again the ones of the games saved before a restart
+    await bot_endpoints.resume_bots()
+    yield
+
+
 app = FastAPI(
     title="El Switcher API documentation",
+    lifespan=lifespan,
 )
 
 app.include_router(router=game_endpoints.router)
 app.include_router(router=player_endpoints.router)
 app.include_router(router=websocket_endpoints.router)
+app.include_router(router=bot_endpoints.router)
+app.include_router(router=metrics_endpoints.router)
 
 app.add_middleware(
     CORSMiddleware,
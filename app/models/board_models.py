@@ -1,16 +1,16 @@
 from app.db.db import Base
 from app.db.enums import Colors
-from sqlalchemy import Column, Integer, ForeignKey, JSON
+from sqlalchemy import Column, Integer, ForeignKey
+from app.db.board_codec import PackedBoard
 from sqlalchemy.orm import relationship
 from app.models.game_models import Game
-import numpy as np
 import random
 
 class Board(Base):
     __tablename__ = "board"
 
     game_id = Column (Integer, ForeignKey("game.id"), primary_key=True)
-    color_distribution = Column(JSON, nullable=True) #Almacena la matriz como un JSON
+    color_distribution = Column(PackedBoard, nullable=True) #Almacena la matriz como un string de 36 caracteres
     
     #Relacion one-to-one entre game y borad
     game = relationship ("Game", back_populates="board", uselist=False)
@@ -14,6 +14,8 @@ class Player(Base):
     playerState = Column(Enum(PlayerState), nullable = False, default = PlayerState.SEARCHING)
     token = Column(String, default = None)
     blocked = Column(Boolean, default=False)
+    # Played by the server, the scheduler registers it again after a restart
+    bot = Column(Boolean, default=False)
 
     #relation many-to-one between player and game
     game_id = Column(Integer, ForeignKey("game.id", ondelete="SET NULL"), nullable = True, default = None)
@@ -1,9 +1,21 @@
+from app.db.board_codec import decode_board, encode_board, is_packed_board
 from app.db.enums import Colors
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List
 
 class BoardSchemaIn(BaseModel):
     game_id: int
 
 class BoardSchemaOut(BaseModel):
-    color_distribution: List[List[Colors]]
\ No newline at end of file
+    color_distribution: List[List[Colors]]
+
+    # Also accept a board packed as a 36 character string
+    @field_validator("color_distribution", mode="before")
+    @classmethod
+    def unpack_board(cls, value):
+        if is_packed_board(value):
+            return decode_board(value)
+        return value
+
+    def packed(self) -> str:
+        return encode_board(self.color_distribution)
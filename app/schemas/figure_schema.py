@@ -1,7 +1,7 @@
-from app.db.enums import FigTypeAndDifficulty
+from app.db.enums import FigTypeAndDifficulty, MovementType
 from pydantic import BaseModel
 from app.schemas.movement_schema import Coordinate
-from typing import List
+from typing import List, Optional
 from app.db.enums import Colors
 
 class FigureInBoardSchema(BaseModel):
@@ -19,4 +19,21 @@ class FigureToDiscardSchema(BaseModel):
     associated_player: int
     figure_board: str
     clicked_x : int
-    clicked_y : int
\ No newline at end of file
+    clicked_y : int
+
+class SwapPreviewSchema(BaseModel):
+    movement_type: MovementType
+    piece_1_coordinates: Coordinate
+    piece_2_coordinates: Coordinate
+    formed_figures: List[FigureInBoardSchema]
+    destroyed_figures: List[FigureInBoardSchema]
+
+class HintMovementSchema(BaseModel):
+    movement_type: MovementType
+    piece_1_coordinates: Coordinate
+    piece_2_coordinates: Coordinate
+
+class HintSchema(BaseModel):
+    figure: Optional[FigureInBoardSchema]
+    movements: List[HintMovementSchema]
+    timed_out: bool
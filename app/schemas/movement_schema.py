@@ -1,5 +1,7 @@
 from app.schemas.movement_cards_schema import MovementCardSchema
+from app.db.enums import MovementType
 from pydantic import BaseModel
+from typing import List
 from typing_extensions import Annotated
 from pydantic.functional_validators import AfterValidator
 
@@ -26,3 +28,8 @@ class MovementSchema(BaseModel):
     movement_card: MovementCardSchema
     piece_1_coordinates: Coordinate
     piece_2_coordinates: Coordinate
+
+class LegalMovementSchema(BaseModel):
+    movement_type: MovementType
+    piece_1_coordinates: Coordinate
+    targets: List[Coordinate]
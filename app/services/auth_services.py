@@ -1,14 +1,15 @@
 from starlette.requests import Request
-from sqlalchemy.orm import Session
-from app.db.db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db import AsyncSessionLocal
 from app.models.player_models import Player
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import HTTPException, status
 from typing import Optional
 
-async def verify_token_in_db(token: str, db: Session):
-    # query the db in search for the token
-    user = db.query(Player).filter(Player.token == token).first()
+async def verify_token_in_db(token: str, db: AsyncSession):
+    # query the db in search for the token, without blocking the event loop
+    user = (await db.execute(select(Player).where(Player.token == token))).scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -27,10 +28,9 @@ class CustomHTTPBearer(HTTPBearer):
             if scheme.lower() != "bearer":
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid authentication scheme")
 
-            # open db session
-            db: Session = next(get_db())
-            
-            user = await verify_token_in_db(token, db)
+            # open an async db session, the player keeps its columns once it is closed
+            async with AsyncSessionLocal() as db:
+                user = await verify_token_in_db(token, db)
 
             return user
         
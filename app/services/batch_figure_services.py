@@ -0,0 +1,78 @@
+from app.db.constants import BOARD_SIZE
+from app.db.enums import Colors, FigTypeAndDifficulty
+from app.schemas.board_schemas import BoardSchemaOut
+from app.schemas.figure_schema import FigureInBoardSchema
+from app.services.bitboard_services import PLACEMENT_MASKS, COLOR_CODES, to_figure_schemas
+from typing import List, Tuple
+import numpy as np
+
+# Colors by code, as used in the (N, 6, 6) board arrays
+CODE_COLORS = list(Colors)
+
+# Boards are matched in chunks so the (boards, placements) comparison stays small in memory
+BATCH_CHUNK_SIZE = 512
+
+# Every placement of every figure, in the order the path walker finds them
+BATCH_PLACEMENTS = [(fig, tiles) for fig in FigTypeAndDifficulty
+                    for tiles, _, _ in PLACEMENT_MASKS[fig.value[0]]]
+BATCH_PLACEMENT_MASKS = np.array([mask for fig in FigTypeAndDifficulty
+                                  for _, mask, _ in PLACEMENT_MASKS[fig.value[0]]], dtype=np.uint64)
+BATCH_BORDER_MASKS = np.array([border for fig in FigTypeAndDifficulty
+                               for _, _, border in PLACEMENT_MASKS[fig.value[0]]], dtype=np.uint64)
+
+TILE_BITS = np.left_shift(np.uint64(1), np.arange(BOARD_SIZE * BOARD_SIZE, dtype=np.uint64))
+
+
+def boards_to_codes(boards: List[BoardSchemaOut]) -> np.ndarray:
+    """Convert boards into an (N, 6, 6) array of color codes"""
+    return np.array([[[COLOR_CODES[color] for color in row] for row in board.color_distribution]
+                     for board in boards], dtype=np.uint8).reshape(-1, BOARD_SIZE, BOARD_SIZE)
+
+
+def get_batch_color_masks(boards: np.ndarray) -> np.ndarray:
+    """Convert an (N, 6, 6) array of color codes into an (N, colors) array of 36-bit masks"""
+    tiles = boards.reshape(len(boards), BOARD_SIZE * BOARD_SIZE)
+    masks = np.zeros((len(boards), len(CODE_COLORS)), dtype=np.uint64)
+    for code in range(len(CODE_COLORS)):
+        masks[:, code] = np.where(tiles == code, TILE_BITS, np.uint64(0)).sum(axis=1, dtype=np.uint64)
+    return masks
+
+
+def match_boards(boards: np.ndarray, forbidden_colors) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Detect figures in many boards at once.
+    boards is an (N, 6, 6) array of color codes and forbidden_colors one code, or one code per board.
+    Returns (board indexes, placement indexes), sorted by board and then in path walker order.
+    Placement indexes refer to BATCH_PLACEMENTS.
+    """
+    boards = np.asarray(boards)
+    forbidden_colors = np.broadcast_to(np.asarray(forbidden_colors, dtype=np.int64), (len(boards),))
+    board_indexes, placement_indexes = [], []
+
+    for start in range(0, len(boards), BATCH_CHUNK_SIZE):
+        masks = get_batch_color_masks(boards[start:start + BATCH_CHUNK_SIZE])
+        forbidden = forbidden_colors[start:start + BATCH_CHUNK_SIZE, None]
+        found = np.zeros((len(masks), len(BATCH_PLACEMENTS)), dtype=bool)
+        for code in range(len(CODE_COLORS)):
+            color_masks = masks[:, code, None]
+            found |= ((color_masks & BATCH_PLACEMENT_MASKS == BATCH_PLACEMENT_MASKS)
+                      & (color_masks & BATCH_BORDER_MASKS == 0)
+                      & (forbidden != code))
+        chunk_boards, chunk_placements = np.nonzero(found)
+        board_indexes.append(chunk_boards + start)
+        placement_indexes.append(chunk_placements)
+
+    if not board_indexes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(board_indexes), np.concatenate(placement_indexes)
+
+
+def get_figures_in_boards(boards: np.ndarray, forbidden_colors) -> List[List[FigureInBoardSchema]]:
+    """
+    Get all figures of every board in an (N, 6, 6) array of color codes.
+    The figures of each board are the same, in the same order, as get_all_figures_in_board.
+    """
+    figures = [[] for _ in range(len(boards))]
+    for board_index, placement_index in zip(*match_boards(boards, forbidden_colors)):
+        figures[board_index].append(BATCH_PLACEMENTS[placement_index])
+    return [to_figure_schemas(board_figures) for board_figures in figures]
@@ -0,0 +1,85 @@
+from app.db.constants import FIGURE_PLACEMENTS, BOARD_SIZE
+from app.db.enums import Colors, FigTypeAndDifficulty
+from app.schemas.board_schemas import BoardSchemaOut
+from app.schemas.figure_schema import FigureInBoardSchema
+from app.schemas.movement_schema import Coordinate
+from typing import Dict, List, Tuple
+
+# A figure found in the board, as (figure, packed tiles). Schemas are only built for the clients.
+PackedFigure = Tuple[FigTypeAndDifficulty, Tuple[int, ...]]
+
+
+def tile_bit(x: int, y: int) -> int:
+    """Return the bit that represents the tile (x, y) in a 36-bit board mask"""
+    return 1 << (x * BOARD_SIZE + y)
+
+
+def tiles_to_mask(tiles) -> int:
+    """Pack a collection of tile indices into a board mask"""
+    mask = 0
+    for tile in tiles:
+        mask |= 1 << tile
+    return mask
+
+
+def build_placement_masks() -> Dict[str, List[Tuple[Tuple[int, ...], int, int]]]:
+    """
+    For every figure, turn each compiled placement into (tiles, placement mask, border mask).
+    The order is the same in which get_figure_in_board walks the paths: rotation, then x, then y.
+    """
+    return {
+        fig: [(tiles, tiles_to_mask(tiles), tiles_to_mask(neighbours)) for tiles, neighbours in placements]
+        for fig, placements in FIGURE_PLACEMENTS.items()
+    }
+
+
+PLACEMENT_MASKS = build_placement_masks()
+
+# Small integer code of every color, used to pack boards
+COLOR_CODES = {color: code for code, color in enumerate(Colors)}
+COLOR_CODE_BITS = 3
+
+
+def get_color_masks(board: BoardSchemaOut) -> Dict[Colors, int]:
+    """Convert the board into one 36-bit mask per color"""
+    masks = {}
+    for x, row in enumerate(board.color_distribution):
+        for y, color in enumerate(row):
+            masks[color] = masks.get(color, 0) | tile_bit(x, y)
+    return masks
+
+
+def get_board_fingerprint(board: BoardSchemaOut) -> int:
+    """Pack the board into one integer, COLOR_CODE_BITS per tile"""
+    fingerprint = 0
+    for row in reversed(board.color_distribution):
+        for color in reversed(row):
+            fingerprint = fingerprint << COLOR_CODE_BITS | COLOR_CODES[color]
+    return fingerprint
+
+
+def get_figure_in_color_masks(figure_type: tuple, masks: Dict[Colors, int], f_color: Colors) -> List[PackedFigure]:
+    """
+    Get all figures of a certain type in a board given as color masks.
+    A placement is a figure if all its tiles share a color and none of its border tiles has that color.
+    """
+    fig = FigTypeAndDifficulty(figure_type)
+    figures = []
+    for tiles, mask, border in PLACEMENT_MASKS[figure_type[0]]:
+        for color, color_mask in masks.items():
+            if color_mask & mask == mask:
+                if color != f_color and not color_mask & border:
+                    figures.append((fig, tiles))
+                break
+    return figures
+
+
+def tile_to_coordinate(tile: int) -> Coordinate:
+    """Coordinate of a packed tile. Packed tiles are always inside the board, so validation is skipped"""
+    return Coordinate.model_construct(x=tile // BOARD_SIZE, y=tile % BOARD_SIZE)
+
+
+def to_figure_schemas(figures: List[PackedFigure]) -> List[FigureInBoardSchema]:
+    """Build the schemas sent to the clients from packed figures"""
+    return [FigureInBoardSchema.model_construct(fig=fig, tiles=[tile_to_coordinate(tile) for tile in tiles])
+            for fig, tiles in figures]
@@ -0,0 +1,100 @@
+from app.db.constants import BOT_CPU_SHARE, BOT_TURN_BUDGET, HINT_MAX_SWAPS
+from app.db.enums import GameStatus
+from app.models.game_models import Game
+from app.models.player_models import Player
+from app.schemas.figure_schema import HintSchema
+from app.services.game_services import validate_game_capacity, add_player_to_game, calculate_partial_board
+from app.services.hint_services import get_hint, get_hint_figure_types
+from sqlalchemy.orm import Session
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+import asyncio
+import logging
+
+
+class BotScheduler:
+    """
+    Plays the turns of the bots of every game from a single task, one turn at a time and in the order
+    they were notified. play_turn returns the CPU seconds the turn used, and after each turn the task sleeps
+    long enough for the bots to use at most cpu_share of the CPU, so the requests of the human players are
+    served in between. Time spent waiting for the game or the executor doesn't count.
+    """
+
+    def __init__(self, cpu_share: float):
+        self.cpu_share = cpu_share
+        # game id -> ids of its bot players
+        self.bots: Dict[int, Set[int]] = {}
+        self.pending: Deque[int] = deque()
+        self.queued: Set[int] = set()
+        self.play_turn: Optional[Callable[[int], Awaitable[Optional[float]]]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def add_bot(self, game_id: int, player_id: int):
+        self.bots.setdefault(game_id, set()).add(player_id)
+
+    def is_bot(self, game_id: int, player_id: int) -> bool:
+        return player_id in self.bots.get(game_id, ())
+
+    def remove_game(self, game_id: int):
+        self.bots.pop(game_id, None)
+
+    def notify(self, game_id: int):
+        """Queue the game, if it has bots, so the player in turn is checked. Starts the task if needed."""
+        if game_id not in self.bots or game_id in self.queued:
+            return
+        self.pending.append(game_id)
+        self.queued.add(game_id)
+
+        loop = asyncio.get_running_loop()
+        if not self.task or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+
+    async def run(self):
+        while self.pending:
+            game_id = self.pending.popleft()
+            self.queued.discard(game_id)
+
+            used = 0
+            try:
+                used = await self.play_turn(game_id) or 0
+            except Exception:
+                logging.exception(f"Bot turn failed in game {game_id}")
+
+            await asyncio.sleep(used * (1 - self.cpu_share) / self.cpu_share)
+
+
+bot_scheduler = BotScheduler(BOT_CPU_SHARE)
+
+
+def create_bot_players(game: Game, db: Session) -> List[Player]:
+    """Fill the empty seats of the game with bot players"""
+    bots = []
+    while len(game.players) < game.player_amount:
+        validate_game_capacity(game)
+        bot = Player(name=f"Bot {len(game.players) + 1}", blocked=False, bot=True)
+        db.add(bot)
+        db.flush()
+        add_player_to_game(game, bot, db)
+        bot_scheduler.add_bot(game.id, bot.id)
+        bots.append(bot)
+    return bots
+
+
+def register_bots(db: Session) -> List[int]:
+    """
+    Register in the scheduler the bots saved in the database, which starts empty after a restart.
+    Returns the ids of the games in course, so their bot in turn can be notified.
+    """
+    bots = db.query(Player.id, Player.game_id, Game.status).join(Game, Player.game_id == Game.id) \
+        .filter(Player.bot == True, Game.status != GameStatus.finished).all()
+    for player_id, game_id, _ in bots:
+        bot_scheduler.add_bot(game_id, player_id)
+    return sorted({game_id for _, game_id, game_status in bots if game_status is GameStatus.in_game})
+
+
+def plan_bot_turn(game: Game, player: Player) -> HintSchema:
+    """Swaps the bot makes in its turn and the figure it discards, found within BOT_TURN_BUDGET"""
+    board = calculate_partial_board(game)
+    movement_types = [card.movement_type for card in player.movement_cards if card.in_hand]
+    return get_hint(board=board, movement_types=movement_types, fig_types=get_hint_figure_types(player),
+                    f_color=game.forbidden_color, max_swaps=HINT_MAX_SWAPS, time_budget=BOT_TURN_BUDGET)
@@ -0,0 +1,171 @@
+from app.db.constants import VALID_PATHS, PATH_PLACEMENTS, BOARD_SIZE
+from app.db.enums import Colors, FigTypeAndDifficulty
+from app.services.bitboard_services import tiles_to_mask, PackedFigure
+from typing import Dict, List, Tuple
+import threading
+
+FULL_BOARD = (1 << BOARD_SIZE * BOARD_SIZE) - 1
+FIRST_COLUMN = tiles_to_mask(x * BOARD_SIZE for x in range(BOARD_SIZE))
+LAST_COLUMN = FIRST_COLUMN << (BOARD_SIZE - 1)
+
+
+def get_shift(mask: int) -> int:
+    """Index of the top left corner of the rectangle that contains the tiles of the mask"""
+    min_x = ((mask & -mask).bit_length() - 1) // BOARD_SIZE
+    column = FIRST_COLUMN
+    min_y = 0
+    while not mask & column:
+        column <<= 1
+        min_y += 1
+    return min_x * BOARD_SIZE + min_y
+
+
+def build_shape_table() -> Dict[int, List[Tuple[FigTypeAndDifficulty, int, int, Tuple[int, ...], int]]]:
+    """
+    Hash table of the canonical figure shapes: the mask of a rotation moved to the top left corner
+    maps to (figure, figure index, rotation, tile offsets, start offset).
+    Offsets are relative to the top left corner, tiles are kept in get_path_valid order.
+    """
+    order = {fig.value[0]: (index, fig) for index, fig in enumerate(FigTypeAndDifficulty)}
+    shapes = {}
+    for fig, paths in VALID_PATHS.items():
+        fig_index, fig_type = order[fig]
+        for rotation, path in enumerate(paths):
+            start, (tiles, _) = next(iter(PATH_PLACEMENTS[tuple(path)].items()))
+            shift = get_shift(tiles_to_mask(tiles))
+            offsets = tuple(tile - shift for tile in tiles)
+            shapes.setdefault(tiles_to_mask(tiles) >> shift, []).append(
+                (fig_type, fig_index, rotation, offsets, start - shift))
+    return shapes
+
+
+SHAPES = build_shape_table()
+
+SHAPE_SIZES = {shape.bit_count() for shape in SHAPES}
+MAX_SHAPE_SIZE = max(SHAPE_SIZES)
+
+
+def get_component(color_mask: int, tile_mask: int) -> int:
+    """Flood fill the same-color region that contains tile_mask"""
+    component = 0
+    while tile_mask != component:
+        component = tile_mask
+        tile_mask = (component | component << BOARD_SIZE | component >> BOARD_SIZE
+                     | (component & ~LAST_COLUMN) << 1 | (component & ~FIRST_COLUMN) >> 1) & color_mask & FULL_BOARD
+    return component
+
+
+def get_components(color_mask: int) -> List[int]:
+    """Split a color mask into its connected regions"""
+    components = []
+    while color_mask:
+        component = get_component(color_mask, color_mask & -color_mask)
+        components.append(component)
+        color_mask &= ~component
+    return components
+
+
+def match_component(component: int) -> List[Tuple[int, int, int, FigTypeAndDifficulty, Tuple[int, ...]]]:
+    """
+    Match an isolated region against the shape table.
+    Each match is (figure index, rotation, start, figure, tiles): the first three sort it
+    as the path walker would find it.
+    """
+    if component.bit_count() not in SHAPE_SIZES:
+        return []
+    shift = get_shift(component)
+    return [(fig_index, rotation, start + shift, fig, tuple(offset + shift for offset in offsets))
+            for fig, fig_index, rotation, offsets, start in SHAPES.get(component >> shift, ())]
+
+
+def sort_matches(matches: list) -> List[PackedFigure]:
+    """Sort the matches as the path walker would find them"""
+    matches.sort(key=lambda match: match[:3])
+    return [(fig, tiles) for _, _, _, fig, tiles in matches]
+
+
+def get_figures_in_components(masks: Dict[Colors, int], f_color: Colors) -> List[PackedFigure]:
+    """
+    Get all figures in a board given as color masks, labelling every color region once.
+    A figure is an isolated region of 4 or 5 tiles whose shape is in the shape table.
+    """
+    matches = []
+    for color, color_mask in masks.items():
+        if color == f_color:
+            continue
+        for component in get_components(color_mask):
+            matches.extend(match_component(component))
+    return sort_matches(matches)
+
+
+class FigureIndex:
+    """
+    Figures of one board, kept up to date as tiles change.
+    Only the regions that touch a changed tile or one of its neighbours are labelled again,
+    the rest of the previously detected figures are kept.
+    It is used holding its lock, as the event loop and the game executor analyse the same board.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tile_colors = [None] * (BOARD_SIZE * BOARD_SIZE)
+        self.masks: Dict[Colors, int] = {}
+        # component mask -> (color, matches)
+        self.figures: Dict[int, Tuple[Colors, list]] = {}
+
+    def update(self, tile_colors: List[Colors]):
+        """Sync the index with a board given as one color per packed tile"""
+        dirty = 0
+        for tile, color in enumerate(tile_colors):
+            if self.tile_colors[tile] != color:
+                dirty |= 1 << tile
+        if not dirty:
+            return
+
+        self.tile_colors = list(tile_colors)
+        self.masks = {}
+        for tile, color in enumerate(tile_colors):
+            self.masks[color] = self.masks.get(color, 0) | 1 << tile
+
+        dirty |= get_neighbours_mask(dirty)
+        self.figures = {component: figure for component, figure in self.figures.items() if not component & dirty}
+
+        while dirty:
+            tile_mask = dirty & -dirty
+            color = self.tile_colors[tile_mask.bit_length() - 1]
+            component = get_component(self.masks[color], tile_mask)
+            dirty &= ~component
+            matches = match_component(component)
+            if matches:
+                self.figures[component] = (color, matches)
+
+    def copy(self) -> "FigureIndex":
+        """Index that can be updated without changing this one"""
+        figure_index = FigureIndex()
+        figure_index.tile_colors = list(self.tile_colors)
+        figure_index.masks = dict(self.masks)
+        figure_index.figures = dict(self.figures)
+        return figure_index
+
+    def get_figures(self, f_color: Colors) -> List[PackedFigure]:
+        matches = [match for color, figure_matches in self.figures.values() if color != f_color
+                   for match in figure_matches]
+        return sort_matches(matches)
+
+
+def get_neighbours_mask(mask: int) -> int:
+    """Tiles next to the tiles of the mask"""
+    return (mask << BOARD_SIZE | mask >> BOARD_SIZE
+            | (mask & ~LAST_COLUMN) << 1 | (mask & ~FIRST_COLUMN) >> 1) & FULL_BOARD
+
+
+# One index per game, updated every time its partial board is analysed
+figure_indexes: Dict[int, FigureIndex] = {}
+
+
+def get_figure_index(game_id: int) -> FigureIndex:
+    return figure_indexes.setdefault(game_id, FigureIndex())
+
+
+def drop_figure_index(game_id: int):
+    figure_indexes.pop(game_id, None)
@@ -0,0 +1,110 @@
+from app.db.constants import EXECUTOR_WORKERS
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import partial
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+import asyncio
+import threading
+
+# Callbacks left for the event loop by the work running in the executor
+scheduled_callbacks: ContextVar[Optional[List[Callable]]] = ContextVar("scheduled_callbacks", default=None)
+
+
+def call_soon(callback: Callable, *args):
+    """
+    Run callback on the event loop: right away when called from it, and once the work is done when called
+    from the executor, where there is no running loop. If the work fails the callback is dropped.
+    """
+    callbacks = scheduled_callbacks.get()
+    if callbacks is None:
+        return callback(*args)
+    callbacks.append(partial(callback, *args))
+
+
+def create_task(coro: Coroutine):
+    """
+    asyncio.create_task for code that can run in the executor. There the task is created on the event loop
+    once the work is done, so it never uses the session of the request at the same time as the work.
+    Build whatever the coroutine needs from the session before, like the GameManager broadcasts do.
+    """
+    return call_soon(asyncio.create_task, coro)
+
+
+class GameExecutor:
+    """
+    Runs the blocking service work of the endpoints (queries, commits, figure detection) in a bounded thread pool,
+    so it doesn't stall the event loop. The work of the same game runs one at a time, in the order it was submitted.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="game-executor")
+        # game id -> [FIFO lock of the game, work submitted for the game and not finished]
+        self.games: Dict[int, list] = {}
+        # Work waiting for its game or for a free thread, running, and finished
+        self.counters_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+
+    def start(self, work: dict, function: Callable, *args, **kwargs):
+        """Body of the pool threads: run function, keeping the callbacks it leaves for the loop in work"""
+        with self.counters_lock:
+            if work["abandoned"]:
+                return None
+            work["started"] = True
+            self.queued -= 1
+            self.running += 1
+        scheduled_callbacks.set(work["callbacks"])
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self.counters_lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run_in_pool(self, function: Callable, *args, **kwargs) -> Any:
+        work = {"started": False, "abandoned": False, "callbacks": []}
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(copy_context().run, self.start, work, function, *args, **kwargs))
+        except BaseException:
+            # After an error the events of the work describe state that was never committed
+            for callback in work["callbacks"]:
+                for arg in callback.args:
+                    if asyncio.iscoroutine(arg):
+                        arg.close()
+            raise
+        finally:
+            with self.counters_lock:
+                if not work["started"]:
+                    work["abandoned"] = True
+                    self.queued -= 1
+        for callback in work["callbacks"]:
+            callback()
+        return result
+
+    async def run(self, game_id: Optional[int], function: Callable, *args, **kwargs) -> Any:
+        """Run function in the pool after the work submitted before for the same game, if any"""
+        with self.counters_lock:
+            self.queued += 1
+        if game_id is None:
+            return await self.run_in_pool(function, *args, **kwargs)
+
+        game = self.games.setdefault(game_id, [asyncio.Lock(), 0])
+        game[1] += 1
+        try:
+            async with game[0]:
+                return await self.run_in_pool(function, *args, **kwargs)
+        finally:
+            game[1] -= 1
+            if not game[1]:
+                del self.games[game_id]
+
+    def info(self) -> dict:
+        return {"workers": self.max_workers, "running": self.running, "queued": self.queued,
+                "completed": self.completed, "games": len(self.games),
+                "max_game_queue": max((pending for _, pending in self.games.values()), default=0)}
+
+
+game_executor = GameExecutor(EXECUTOR_WORKERS)
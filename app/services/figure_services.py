@@ -1,102 +1,154 @@
-from app.db.constants import VALID_PATHS
+from app.db.constants import PATH_PLACEMENTS, TILE_NEIGHBOURS, BOARD_SIZE, FIGURE_ENGINE, FIGURE_CACHE_SIZE, FIGURE_SCAN_MODE
 from app.db.constants import Movement
-from app.db.enums import FigTypeAndDifficulty
+from app.db.enums import FigTypeAndDifficulty, FigureEngine, FigureScanMode
 from app.models.game_models import Game
 from app.schemas.movement_schema import Coordinate
-from typing import List
+from typing import List, Optional
 from app.schemas.board_schemas import BoardSchemaOut
 from app.services.game_services import calculate_partial_board
 from app.schemas.figure_schema import FigureInBoardSchema
 from app.db.enums import Colors
+from app.services.bitboard_services import (get_color_masks, get_figure_in_color_masks, get_board_fingerprint, tiles_to_mask,
+                                            tile_to_coordinate, to_figure_schemas, PackedFigure)
+from app.services.component_services import get_figures_in_components, get_figure_index, match_component, MAX_SHAPE_SIZE
+from app.services.trie_services import get_figures_in_path_trie
+from app.services.cache_services import LRUCache
+from app.services.memo_services import memoized_view
 import logging
 
+# Packed figures found per (board fingerprint, forbidden color, scanned figure types or None for all of them)
+figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
 def is_figure_isolated(tiles:List[Coordinate], board:BoardSchemaOut) -> bool:
     """Check if a figure is isolated. i.e if the adyacent tiles don't share the same color"""
-    for tile in tiles:
-        #print("checking: " + str(tile))
-        if tile.y > 0:
-            if board.color_distribution[tile.x][tile.y-1] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x, y=tile.y -1) not in tiles:
-                #print("checking up: " + board.color_distribution[tile.y - 1][tile.x].value + "is equal to " + board.color_distribution[tile.y][tile.x].value + "and does not belong in " + str(tiles))
-                return False
-        if tile.y < len(board.color_distribution) - 1:
-            if board.color_distribution[tile.x][tile.y+1] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x, y=tile.y + 1) not in tiles:
-                #print("checking down: " + str(board.color_distribution[tile.y + 1][tile.x].value) + "is equal to " + board.color_distribution[tile.y][tile.x].value + "and does not belong in " + str(tiles))
-                return False
-        if tile.x > 0:
-            if board.color_distribution[tile.x-1][tile.y] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x - 1, y=tile.y) not in tiles:
-                #print("checking left: " + board.color_distribution[tile.y][tile.x - 1].value + "is equal to " + board.color_distribution[tile.y][tile.x].value + "and does not belong in " + str(tiles))
-                return False
-        if tile.x < len(board.color_distribution[0]) - 1:
-            if board.color_distribution[tile.x+1][tile.y] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x + 1, y=tile.y) not in tiles:
-                #print("checking right: " + board.color_distribution[tile.y][tile.x+1].value + "is equal to " + board.color_distribution[tile.y][tile.x].value + "and does not belong in " + str(tiles))
+    actual_board = board.color_distribution
+    packed_tiles = {tile.x * BOARD_SIZE + tile.y for tile in tiles}
+    for tile in packed_tiles:
+        color = actual_board[tile // BOARD_SIZE][tile % BOARD_SIZE]
+        for neighbour in TILE_NEIGHBOURS[tile]:
+            if neighbour not in packed_tiles and actual_board[neighbour // BOARD_SIZE][neighbour % BOARD_SIZE] == color:
                 return False
     return True
 
 def get_path_valid(path:List[Movement], board:BoardSchemaOut, start: Coordinate, f_color: Colors) -> List[Coordinate]:
     """Check if the path is valid. i.e if the tiles in that path share the same color"""
-    current_tile = start
+    placement = PATH_PLACEMENTS[tuple(path)].get(start.x * BOARD_SIZE + start.y)
+    if not placement:
+        return []
     actual_board = board.color_distribution
-    if actual_board[current_tile.x][current_tile.y] == f_color:
+    color = actual_board[start.x][start.y]
+    if color == f_color:
         return []
-    valid_path = []
-    for mov in path:
-        next_tile = None
-        if mov in (Movement.UP, Movement.TUP) and current_tile.x > 0:
-            next_tile = Coordinate(x=current_tile.x-1, y=current_tile.y)
-        elif mov in (Movement.DOWN, Movement.TDOWN) and current_tile.x < len(actual_board[0]) - 1:
-            next_tile = Coordinate(x=current_tile.x+1, y=current_tile.y)
-        elif mov in (Movement.LEFT, Movement.TLEFT) and current_tile.y > 0:
-            next_tile = Coordinate(x=current_tile.x, y=current_tile.y - 1)
-        elif mov in (Movement.RIGHT, Movement.TRIGHT) and current_tile.y < len(actual_board) - 1:
-            next_tile = Coordinate(x=current_tile.x, y=current_tile.y + 1)
-        else:
-            return []
-        if actual_board[next_tile.x][next_tile.y] == actual_board[current_tile.x][current_tile.y]:
-            #For tmoves, append the tile that's outside the path and continue traveling with the previous tile.
-            #This assures that each tile is only appended once.
-            if mov in (Movement.UP, Movement.DOWN, Movement.LEFT, Movement.RIGHT):
-                valid_path.append(current_tile)
-                current_tile = next_tile
-            else:
-                valid_path.append(next_tile)
-        else:
+    tiles = placement[0]
+    for tile in tiles:
+        if actual_board[tile // BOARD_SIZE][tile % BOARD_SIZE] != color:
             return []
-    valid_path.append(current_tile)
-    return valid_path
+    return [tile_to_coordinate(tile) for tile in tiles]
 
 
 def get_figure_in_board(figure_type:tuple, board: BoardSchemaOut, f_color: Colors) -> List[FigureInBoardSchema]:
     """
     Get all figures of a certain type in the board. If the list is empty, the figure is not in the board.
     """
-    figures = []
-    possible_paths = VALID_PATHS[figure_type[0]]
-    for path in possible_paths:
-        for x in range(6):
-            for y in range(6):
-                valid_fig = get_path_valid(path=path, board=board, start=Coordinate(x=x, y=y), f_color=f_color)
-                if valid_fig and is_figure_isolated(valid_fig, board):
-                    figures.append(FigureInBoardSchema(fig=figure_type, tiles=valid_fig))
-    return figures
+    key = (get_board_fingerprint(board), f_color, (figure_type[0],))
+    figures = figure_cache.get(key)
+    if figures is None:
+        figures = get_figure_in_color_masks(figure_type=figure_type, masks=get_color_masks(board), f_color=f_color)
+        figure_cache.put(key, figures)
+    return to_figure_schemas(figures)
+
+
+def get_figure_at_tile(figure_type: tuple, board: BoardSchemaOut, x: int, y: int, f_color: Colors) -> Optional[FigureInBoardSchema]:
+    """
+    Get the figure of a certain type that contains the tile (x, y). If there is none, returns None.
+    Only the color region of that tile is visited, and the search stops as soon as it is bigger than any figure.
+    """
+    actual_board = board.color_distribution
+    color = actual_board[x][y]
+    if color == f_color:
+        return None
+
+    start = x * BOARD_SIZE + y
+    region = {start}
+    pending = [start]
+    while pending:
+        tile = pending.pop()
+        for neighbour in TILE_NEIGHBOURS[tile]:
+            if neighbour not in region and actual_board[neighbour // BOARD_SIZE][neighbour % BOARD_SIZE] == color:
+                region.add(neighbour)
+                if len(region) > MAX_SHAPE_SIZE:
+                    return None
+                pending.append(neighbour)
 
+    fig = FigTypeAndDifficulty(figure_type)
+    for _, _, _, match_fig, tiles in match_component(tiles_to_mask(region)):
+        if match_fig == fig:
+            return to_figure_schemas([(match_fig, tiles)])[0]
+    return None
 
-def get_all_figures_in_board(game: Game) -> List[FigureInBoardSchema]:
+
+def get_figure_types_in_hands(game: Game) -> List[FigTypeAndDifficulty]:
+    """
+    Get the figure types of the cards that are in the players' hands, without repetitions.
     """
-    Get all the figures that are in player's hands.
+    figures = set()
+
+    for player in game.players:
+        for card in player.figure_cards:
+            if card.in_hand:
+                figures.add(card.type_and_difficulty)
+
+    return [fig for fig in FigTypeAndDifficulty if fig in figures]
+
+
+def get_figure_types_to_scan(game: Game) -> Optional[List[FigTypeAndDifficulty]]:
+    """
+    Figure types to look for according to FIGURE_SCAN_MODE. None means every type.
+    """
+    if FIGURE_SCAN_MODE == FigureScanMode.in_hand:
+        return get_figure_types_in_hands(game)
+    return None
+
+
+@memoized_view
+def get_all_figures_in_board(game: Game, engine: FigureEngine = None,
+                             fig_types: Optional[List[FigTypeAndDifficulty]] = None) -> List[FigureInBoardSchema]:
+    """
+    Get all the figures that are in the board, or only the ones of fig_types if given.
+    The detection engine defaults to FIGURE_ENGINE.
     """
     board = calculate_partial_board(game)
-    # figures = []
-    all_figures = []
+    scanned = None if fig_types is None else tuple(fig.value[0] for fig in fig_types)
+    key = (get_board_fingerprint(board), game.forbidden_color, scanned)
+    figures = figure_cache.get(key)
+    if figures is None:
+        figures = find_all_figures_in_board(board=board, game=game, engine=engine or FIGURE_ENGINE, fig_types=fig_types)
+        figure_cache.put(key, figures)
+    return to_figure_schemas(figures)
+
 
-    # for player in game.players:
-    #     for card in player.figure_cards:
-    #         if card.type_and_difficulty not in figures:
-    #             figures.append(card.type_and_difficulty)
-    
-    for fig in FigTypeAndDifficulty:
-        fig_in_board = get_figure_in_board(figure_type=fig.value, board=board, f_color=game.forbidden_color)
-        if fig_in_board:
-            all_figures.extend(fig_in_board)
+def find_all_figures_in_board(board: BoardSchemaOut, game: Game, engine: FigureEngine,
+                              fig_types: Optional[List[FigTypeAndDifficulty]] = None) -> List[PackedFigure]:
+    """Run the detection engine over the partial board of the game. Figures are returned packed."""
+    masks = get_color_masks(board)
 
-    return all_figures
+    if engine == FigureEngine.components:
+        figures = get_figures_in_components(masks=masks, f_color=game.forbidden_color)
+    elif engine == FigureEngine.incremental:
+        figure_index = get_figure_index(game.id)
+        with figure_index.lock:
+            figure_index.update([color for row in board.color_distribution for color in row])
+            figures = figure_index.get_figures(f_color=game.forbidden_color)
+    elif engine == FigureEngine.trie:
+        figures = get_figures_in_path_trie(tile_colors=[color for row in board.color_distribution for color in row],
+                                           masks=masks, f_color=game.forbidden_color)
+    else:
+        figures = []
+        for fig in (FigTypeAndDifficulty if fig_types is None else fig_types):
+            figures.extend(get_figure_in_color_masks(figure_type=fig.value, masks=masks, f_color=game.forbidden_color))
+        return figures
 
+    if fig_types is not None:
+        figures = [figure for figure in figures if figure[0] in fig_types]
+    return figures
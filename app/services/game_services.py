@@ -1,5 +1,5 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload, raiseload, object_session
 from app.models.game_models import Game
 from app.models.player_models import Player
 from app.schemas.game_schemas import GameSchemaOut
@@ -8,18 +8,58 @@ from app.db.enums import GameStatus
 from app.schemas.movement_cards_schema import MovementCardSchema
 from app.schemas.player_schemas import PlayerGameSchemaOut
 from app.schemas.movement_schema import MovementSchema, Coordinate
-from app.db.enums import GameStatus, FigTypeAndDifficulty
-from app.services.movement_services import reassign_movement_card
-from app.db.constants import AMOUNT_OF_FIGURES_DIFFICULT, AMOUNT_OF_FIGURES_EASY
+from app.db.enums import GameStatus, FigTypeAndDifficulty, Colors
+from app.services.movement_services import return_movement_card
+from app.db.constants import AMOUNT_OF_FIGURES_DIFFICULT, AMOUNT_OF_FIGURES_EASY, BOARD_SIZE, LAZY_LOAD_AUDIT
 import random
-from typing import List
+import threading
+from typing import Dict, List, Optional
 from app.schemas.board_schemas import BoardSchemaOut
 from app.models.figure_card_model import FigureCard
 from app.schemas.figure_schema import FigTypeAndDifficulty, FigureInBoardSchema, FigureToDiscardSchema
 from app.schemas.figure_card_schema import FigureCardSchema
+from app.services.component_services import drop_figure_index
+from app.services.memo_services import memoized_view
+from app.services.bitboard_services import tile_to_coordinate
 import logging
 
 
+def get_game_load_options() -> list:
+    """
+    Loader options for the game aggregate: the board in the game query, then the players and their cards and
+    movements in one query per relationship, whatever the amount of players. Views and broadcasts walk all of them.
+    With LAZY_LOAD_AUDIT every other relationship of the aggregate raises when it is lazy loaded.
+    """
+    audit = [raiseload("*")] if LAZY_LOAD_AUDIT else []
+    return [
+        joinedload(Game.board).options(*audit),
+        selectinload(Game.players).options(
+            selectinload(Player.movement_cards).options(*audit),
+            selectinload(Player.figure_cards).options(*audit),
+            selectinload(Player.movements).options(*audit),
+            *audit
+        ),
+        *audit
+    ]
+
+
+def reload_game(game: Game) -> Game:
+    """
+    Read the game aggregate of the session again, overwriting the objects it already holds. Endpoints call it
+    once they hold the game in the executor, so they see what the work before them committed and not what was
+    read while they waited. Games that are not in a session are returned as they are.
+    """
+    db = object_session(game)
+    if db is None:
+        return game
+
+    game = db.query(Game).options(*get_game_load_options()).populate_existing().filter(Game.id == game.id).first()
+    if not game:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Partida no encontrada")
+    return game
+
+
 def validate_game_capacity(game: Game):
     """validates if the player can join the game based on the capacity set by the host"""
     if len(game.players) >= game.player_amount:
@@ -34,6 +74,8 @@ def add_player_to_game(game: Game, player: Player, db: Session):
     if len(game.players) + 1 == game.player_amount:
         game.status = GameStatus.full
 
+    game.players.append(player)
+
 
 def search_player_in_game(player: Player, game: Game):
     """
@@ -84,7 +126,10 @@ def remove_player_from_game(player: Player, game: Game, db: Session):
         # but we need the right player amount to calculate next turn
         game.player_amount -= 1
 
+    game.players.remove(player)
+
 
+@memoized_view
 def convert_game_to_schema(game: Game) -> GameSchemaOut:
     """return the schema view of Game"""
     game_out = GameSchemaOut(id=game.id, name=game.name, player_amount=game.player_amount, status=game.status,
@@ -144,6 +189,8 @@ def end_game(game: Game, db: Session):
         player.blocked = False
         clear_all_cards(player, db)
         
+    drop_figure_index(game.id)
+    drop_partial_board(game.id)
     db.delete(game)
 
 
@@ -168,6 +215,7 @@ def initialize_figure_decks(game: Game, db: Session):
             easy_cards_in_deck[card_type] += 1
             card = FigureCard(type_and_difficulty=card_type,
                               associated_player=player.id, in_hand=False, blocked=False)
+            player.figure_cards.append(card)
             db.add(card)
 
         for _ in range(diff_cards_per_player):
@@ -176,11 +224,9 @@ def initialize_figure_decks(game: Game, db: Session):
             diff_cards_in_deck[card_type] += 1
             card = FigureCard(type_and_difficulty=card_type,
                               associated_player=player.id, in_hand=False, blocked=False)
+            player.figure_cards.append(card)
             db.add(card)
 
-    db.commit()
-    db.refresh(game)
-
 
 def deal_figure_cards_to_player(player: Player, db: Session):
     if not player.blocked:
@@ -193,9 +239,6 @@ def deal_figure_cards_to_player(player: Player, db: Session):
                 card = random.choice(remaining_cards)
                 card.in_hand = True
 
-        db.commit()
-        db.refresh(player)
-
 
 def clear_all_cards(player: Player, db: Session):
     m_player = db.merge(player)
@@ -204,8 +247,8 @@ def clear_all_cards(player: Player, db: Session):
     for card in m_player.figure_cards:
         db.delete(card)
 
-    db.commit()
-    db.refresh(m_player)
+    m_player.movement_cards.clear()
+    m_player.figure_cards.clear()
 
 
 def is_player_in_turn(player: Player, game: Game):
@@ -219,26 +262,26 @@ def has_partial_movement(player: Player):
     return False
 
 
-def remove_last_partial_movement(player: Player, db: Session) -> bool:
-    partial_movements = [
-        movement for movement in player.movements if not movement.final_movement]
+def remove_last_partial_movement(game: Game, player: Player, db: Session) -> bool:
+    partial_movements = {
+        movement.id: movement for movement in player.movements if not movement.final_movement}
 
     if not partial_movements or len(partial_movements) > 3:
         return False
 
-    # Ordenar por id en orden descendente y obtener el último movimiento parcial
-    if len(partial_movements) == 1:
-        last_partial_movement = partial_movements[0]
-    else:
-        last_partial_movement = sorted(
-            partial_movements, key=lambda m: m.id, reverse=True)[0]
-    # Eliminar el movimiento de la base de datos
+    # El tablero parcial guarda el tablero anterior a cada movimiento, volvemos al anterior al último
+    partial_board = get_partial_board(game.id)
+    with partial_board.lock:
+        last_id = partial_board.undo(player.id, partial_movements.keys())
+    if last_id is None:
+        # Todavia no se calculo el tablero de este turno, por ejemplo despues de reiniciar el servidor
+        last_id = max(partial_movements)
+    last_partial_movement = partial_movements[last_id]
 
-    reassign_movement_card(last_partial_movement, player, db)
+    return_movement_card(last_partial_movement, player)
 
     player.movements.remove(last_partial_movement)
     db.delete(last_partial_movement)
-    db.commit()
 
     return True
 
@@ -254,25 +297,107 @@ def remove_all_partial_movements(player: Player, db: Session):
         player.movements.remove(partial_movement)
         db.delete(partial_movement)
 
-    db.commit()
 
+# Color of each stored value, boards read from the database hold the values
+COLORS_BY_VALUE = {color.value: color for color in Colors}
 
+
+def to_colors(board: List[list]) -> List[List[Colors]]:
+    """Board of colors. Looking the values up avoids the Colors(...) call, and hashing the members, per tile."""
+    return [[color if color.__class__ is Colors else COLORS_BY_VALUE[color] for color in row] for row in board]
+
+
+class PartialBoard:
+    """
+    Partial board of a game, kept in memory so it is not rebuilt from the movements on every read.
+    It is valid for a base board, player in turn and list of partial movements. When the list only gained
+    its last movement those two tiles are swapped, and when it lost it the board before that movement is restored.
+    Broadcasts read it from the event loop while the executor updates it, so it is only used holding its lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.base = None
+        self.player_id = None
+        # (id, x1, y1, x2, y2) of the partial movements applied to the board, in order
+        self.movements = []
+        # Board before each of the movements
+        self.snapshots: List[List[List[Colors]]] = []
+        self.board: List[List[Colors]] = []
+        # Incremented every time the board changes
+        self.version = 0
+
+    def swap(self, movement: tuple):
+        _, x1, y1, x2, y2 = movement
+        self.snapshots.append([row[:] for row in self.board])
+        self.board[x1][y1], self.board[x2][y2] = self.board[x2][y2], self.board[x1][y1]
+
+    def sync(self, base: List[list], player_id: int, movements: List[tuple]):
+        if self.base != base or self.player_id != player_id:
+            self.base = [row[:] for row in base]
+            self.player_id = player_id
+            self.board = to_colors(base)
+            self.movements = []
+            self.snapshots = []
+            self.version += 1
+
+        if movements == self.movements:
+            return
+        if movements[:-1] == self.movements:
+            self.swap(movements[-1])
+        elif self.movements[:-1] == movements:
+            self.board = self.snapshots.pop()
+        else:
+            self.board = to_colors(base)
+            self.snapshots = []
+            for movement in movements:
+                self.swap(movement)
+        self.movements = movements
+        self.version += 1
+
+    def undo(self, player_id: int, movement_ids) -> Optional[int]:
+        """
+        Restore the board before the last movement, if the board holds exactly the movements of movement_ids
+        of the player. Returns the id of the movement undone, or None if the board holds other movements.
+        """
+        if self.player_id != player_id or {movement[0] for movement in self.movements} != set(movement_ids):
+            return None
+        movement = self.movements.pop()
+        self.board = self.snapshots.pop()
+        self.version += 1
+        return movement[0]
+
+
+# One partial board per game
+partial_boards: Dict[int, PartialBoard] = {}
+
+
+def get_partial_board(game_id: int) -> PartialBoard:
+    return partial_boards.setdefault(game_id, PartialBoard())
+
+
+def drop_partial_board(game_id: int):
+    partial_boards.pop(game_id, None)
+
+
+@memoized_view
 def calculate_partial_board(game: Game):
     actual_player: Player = game.players[game.player_turn]
 
-    actual_board = game.board
-    partial_board = [fila[:] for fila in actual_board.color_distribution]
-
     player_partial_movs = [
         mov for mov in actual_player.movements if not mov.final_movement]
     player_partial_movs = sorted(player_partial_movs, key=lambda mov: mov.id)
 
-    for mov in player_partial_movs:
-        partial_board[mov.x1][mov.y1], partial_board[mov.x2][mov.y2] = (
-            partial_board[mov.x2][mov.y2], partial_board[mov.x1][mov.y1]
-        )
+    # Without partial movements it is the board of the game, nothing to keep in memory
+    if not player_partial_movs:
+        return BoardSchemaOut.model_construct(color_distribution=to_colors(game.board.color_distribution))
+
+    partial_board = get_partial_board(game.id)
+    with partial_board.lock:
+        partial_board.sync(base=game.board.color_distribution, player_id=actual_player.id,
+                           movements=[(mov.id, mov.x1, mov.y1, mov.x2, mov.y2) for mov in player_partial_movs])
 
-    board_sch = BoardSchemaOut(color_distribution=partial_board)
+        board_sch = BoardSchemaOut.model_construct(color_distribution=[row[:] for row in partial_board.board])
 
     return board_sch
 
@@ -377,9 +502,6 @@ def block_player(figure: FigureCardSchema, player: Player, db: Session):
                        figure.type and card.in_hand), None)  # ojo aca
     figure_card.blocked = True
 
-    db.commit()
-    db.refresh(m_player)
-
 
 def unlock_remaining_card(player: Player, db: Session):
     m_player = db.merge(player)
@@ -389,9 +511,7 @@ def unlock_remaining_card(player: Player, db: Session):
             (card for card in m_player.figure_cards if card.in_hand), None)  # ojo aca
         figure_card.blocked = False
 
-    db.commit()
-    db.refresh(m_player)
-
+@memoized_view
 def get_move_tiles(game:Game) -> List[Coordinate]:
     player_in_turn_obj : Player = game.players[game.player_turn]
     player_partial_movs = [
@@ -399,16 +519,11 @@ def get_move_tiles(game:Game) -> List[Coordinate]:
     
     player_partial_movs = sorted(player_partial_movs, key=lambda mov: mov.id)
 
-    partial_mov_tiles = []
+    # Packed tiles (x * BOARD_SIZE + y), in order of appearance and without repetitions
+    partial_mov_tiles = {}
 
     for mov in player_partial_movs:
-        cord_1 = Coordinate(x=mov.x1, y=mov.y1)
-        cord_2 = Coordinate(x=mov.x2, y=mov.y2)
-        if cord_1 not in partial_mov_tiles:
-            partial_mov_tiles.append(cord_1)
-
-        if cord_2 not in partial_mov_tiles:
-            partial_mov_tiles.append(cord_2)
+        partial_mov_tiles[mov.x1 * BOARD_SIZE + mov.y1] = None
+        partial_mov_tiles[mov.x2 * BOARD_SIZE + mov.y2] = None
         
-    return partial_mov_tiles
-
+    return [tile_to_coordinate(tile) for tile in partial_mov_tiles]
@@ -0,0 +1,157 @@
+from app.db.constants import HINT_MAX_SWAPS, HINT_TIME_BUDGET, BOARD_SIZE
+from app.db.enums import Colors, FigTypeAndDifficulty, MovementType
+from app.models.player_models import Player
+from app.schemas.board_schemas import BoardSchemaOut
+from app.schemas.figure_schema import HintSchema, HintMovementSchema
+from app.services.bitboard_services import PLACEMENT_MASKS, get_color_masks, tile_to_coordinate, to_figure_schemas, PackedFigure
+from app.services.preview_services import get_swaps
+from typing import Dict, List, Optional, Tuple
+import time
+
+# A swap of the hint, as (movement type, tile 1, tile 2)
+PackedSwap = Tuple[MovementType, int, int]
+
+
+class HintTimeout(Exception):
+    pass
+
+
+def get_hint_figure_types(player: Player) -> List[FigTypeAndDifficulty]:
+    """
+    Figure types the player can discard: the cards in hand that are not blocked,
+    or the blocked one if it is the last card left.
+    """
+    figures = {card.type_and_difficulty for card in player.figure_cards
+               if card.in_hand and (not card.blocked or len(player.figure_cards) == 1)}
+    return [fig for fig in FigTypeAndDifficulty if fig in figures]
+
+
+class HintSearch:
+    """
+    Iterative deepening search over sequences of up to max_swaps swaps, each one using a different
+    movement card in hand. The first sequence found is the shortest one.
+
+    - A placement needs every tile of its figure and none of its border tiles to have its color, and a swap
+      changes two tiles at most, so half its mismatched tiles is a lower bound of the swaps left.
+      Nodes where no placement is reachable with the swaps left are pruned.
+    - Colors that do not have enough tiles for a figure, or that can't fit outside its border, are never tried.
+    - A swap that doesn't touch a reachable placement or its border leaves its mismatches as they are, so it is
+      only tried if some placement would still be reachable with one swap less.
+    - The transposition table keeps, for every board and cards left, the most swaps it was searched with.
+    """
+
+    def __init__(self, board: BoardSchemaOut, movement_types: List[MovementType],
+                 fig_types: List[FigTypeAndDifficulty], f_color: Colors, max_swaps: int, time_budget: float):
+        self.masks = get_color_masks(board)
+        self.colors = [color for color in Colors if color in self.masks and color != f_color]
+        self.movement_types = sorted(movement_types, key=lambda movement_type: movement_type.value)
+        self.max_swaps = min(max_swaps, len(movement_types))
+        self.deadline = time.monotonic() + time_budget
+        self.swaps = {movement_type: get_swaps(movement_type) for movement_type in set(movement_types)}
+        self.transpositions: Dict[tuple, int] = {}
+        self.nodes = 0
+
+        # (figure, tiles, placement mask, border mask) of every placement, for each color that can form it
+        self.placements = {color: [] for color in self.colors}
+        for fig in fig_types:
+            for tiles, mask, border in PLACEMENT_MASKS[fig.value[0]]:
+                for color in self.colors:
+                    count = self.masks[color].bit_count()
+                    if len(tiles) <= count <= len(tiles) + BOARD_SIZE * BOARD_SIZE - (mask | border).bit_count():
+                        self.placements[color].append((fig, tiles, mask, border))
+
+    def get_reachable(self, swaps_left: int) -> Tuple[Optional[PackedFigure], int, bool]:
+        """
+        Figure already formed, if any, the tiles of the placements that can still be formed with the swaps left,
+        and whether any of them can be formed with one swap less.
+        """
+        region = 0
+        close = False
+        for color in self.colors:
+            color_mask = self.masks[color]
+            for fig, tiles, mask, border in self.placements[color]:
+                mismatches = (mask & ~color_mask).bit_count() + (border & color_mask).bit_count()
+                if not mismatches:
+                    return (fig, tiles), 0, True
+                if mismatches <= 2 * swaps_left:
+                    region |= mask | border
+                    close = close or mismatches <= 2 * (swaps_left - 1)
+        return None, region, close
+
+    def swap(self, tile_1: int, tile_2: int, color_1: Colors, color_2: Colors):
+        bits = 1 << tile_1 | 1 << tile_2
+        self.masks[color_1] ^= bits
+        self.masks[color_2] ^= bits
+
+    def get_color(self, tile: int) -> Colors:
+        for color, color_mask in self.masks.items():
+            if color_mask >> tile & 1:
+                return color
+
+    def search(self, cards: Tuple[MovementType, ...], swaps_left: int) -> Optional[Tuple[List[PackedSwap], PackedFigure]]:
+        self.nodes += 1
+        if time.monotonic() > self.deadline:
+            raise HintTimeout()
+
+        figure, region, close = self.get_reachable(swaps_left)
+        if figure:
+            return [], figure
+        if not swaps_left or not region:
+            return None
+
+        key = (tuple(sorted(self.masks.items(), key=lambda item: item[0].value)), cards)
+        if self.transpositions.get(key, -1) >= swaps_left:
+            return None
+
+        for index, movement_type in enumerate(cards):
+            if movement_type in cards[:index]:
+                continue
+            cards_left = cards[:index] + cards[index + 1:]
+            for tile_1, tile_2 in self.swaps[movement_type]:
+                if not close and not (region >> tile_1 & 1 or region >> tile_2 & 1):
+                    continue
+                color_1, color_2 = self.get_color(tile_1), self.get_color(tile_2)
+                if color_1 == color_2:
+                    continue
+                self.swap(tile_1, tile_2, color_1, color_2)
+                found = self.search(cards_left, swaps_left - 1)
+                self.swap(tile_1, tile_2, color_1, color_2)
+                if found:
+                    swaps, figure = found
+                    return [(movement_type, tile_1, tile_2)] + swaps, figure
+
+        self.transpositions[key] = swaps_left
+        return None
+
+    def run(self) -> Tuple[Optional[Tuple[List[PackedSwap], PackedFigure]], bool]:
+        """Shortest sequence of swaps and the figure it forms, and whether the search ran out of time"""
+        cards = tuple(self.movement_types)
+        try:
+            for swaps_left in range(self.max_swaps + 1):
+                found = self.search(cards, swaps_left)
+                if found:
+                    return found, False
+        except HintTimeout:
+            return None, True
+        return None, False
+
+
+def get_hint(board: BoardSchemaOut, movement_types: List[MovementType], fig_types: List[FigTypeAndDifficulty],
+             f_color: Colors, max_swaps: int = HINT_MAX_SWAPS, time_budget: float = HINT_TIME_BUDGET) -> HintSchema:
+    """
+    Shortest sequence of swaps, with the movement cards given, that forms one of the figures given in the board.
+    If there is none, or the time budget runs out first, the hint has no figure.
+    """
+    found, timed_out = HintSearch(board=board, movement_types=movement_types, fig_types=fig_types,
+                                  f_color=f_color, max_swaps=max_swaps, time_budget=time_budget).run()
+    if not found:
+        return HintSchema(figure=None, movements=[], timed_out=timed_out)
+
+    swaps, figure = found
+    return HintSchema.model_construct(
+        figure=to_figure_schemas([figure])[0],
+        movements=[HintMovementSchema.model_construct(movement_type=movement_type,
+                                                      piece_1_coordinates=tile_to_coordinate(tile_1),
+                                                      piece_2_coordinates=tile_to_coordinate(tile_2))
+                   for movement_type, tile_1, tile_2 in swaps],
+        timed_out=False)
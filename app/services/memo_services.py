@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper, Session, object_session
+from sqlalchemy.orm.state import InstanceState
+from functools import wraps
+from typing import Optional
+
+# Key of the memo in Session.info
+VIEWS_KEY = "views"
+
+
+def get_view_memo(game) -> Optional[dict]:
+    """Memo of the session the game belongs to, or None if it is not in one"""
+    # Mapped instances keep their state in __dict__, mocks don't have one. Cheaper than object_session,
+    # which raises for anything that is not mapped.
+    state = getattr(game, "__dict__", {}).get("_sa_instance_state")
+    session = state.session if isinstance(state, InstanceState) else None
+    if session is None:
+        return None
+    return session.info.setdefault(VIEWS_KEY, {})
+
+
+def freeze(value):
+    """Hashable version of an argument"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def memoized_view(function):
+    """
+    Share a view of a game between every response and broadcast of the same session and state.
+    The memo lives in the session of the game and is cleared every time the session flushes, commits
+    or rolls back, adds an object, or one of its objects changes, so a view never outlives the state it read.
+    """
+    @wraps(function)
+    def wrapper(game, *args, **kwargs):
+        memo = get_view_memo(game)
+        if memo is None:
+            return function(game, *args, **kwargs)
+
+        key = (function.__name__, game.id, freeze(args), freeze(tuple(sorted(kwargs.items()))))
+        if key not in memo:
+            memo[key] = function(game, *args, **kwargs)
+        return memo[key]
+    return wrapper
+
+
+def clear_view_memo(session: Session, *args):
+    session.info.pop(VIEWS_KEY, None)
+
+
+def clear_changed_memo(target, *args):
+    """Attribute event: the views of the session of target may have read the old value"""
+    session = object_session(target)
+    if session is not None:
+        clear_view_memo(session)
+
+
+def listen_to_changes(mapper: Mapper, class_):
+    # Sessions don't autoflush, and the endpoints commit once at the end, so the attributes are watched instead
+    for column in mapper.column_attrs:
+        event.listen(column.class_attribute, "set", clear_changed_memo)
+    for relationship in mapper.relationships:
+        for attribute_event in (("append", "remove") if relationship.uselist else ("set",)):
+            event.listen(relationship.class_attribute, attribute_event, clear_changed_memo)
+
+
+for session_event in ("after_flush", "after_commit", "after_rollback", "after_soft_rollback", "transient_to_pending"):
+    event.listen(Session, session_event, clear_view_memo)
+
+event.listen(Mapper, "mapper_configured", listen_to_changes)
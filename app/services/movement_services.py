@@ -1,11 +1,12 @@
-from app.db.constants import VALID_MOVES
-from app.schemas.movement_schema import MovementSchema
+from app.db.constants import MOVE_TARGETS, BOARD_SIZE
+from app.schemas.movement_schema import MovementSchema, LegalMovementSchema, Coordinate
 from app.models.game_models import Game
 from app.models.player_models import Player
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.models.movement_card_model import MovementCard
 import random
+from typing import List, Optional
 from app.db.enums import MovementType
 from app.models.movement_model import Movement
 
@@ -33,30 +34,47 @@ def deal_initial_movement_cards(db: Session, game: Game):
     for player in players:
         deal_movement_cards(player, db)
 
-    db.commit()
-
 
 
 
 def validate_movement(movement: MovementSchema, game: Game):
     # Retrieve the type of movement card being used
     movement_card_type = movement.movement_card.movement_type.name
-    if movement_card_type not in VALID_MOVES:
+    if movement_card_type not in MOVE_TARGETS:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Tipo de movimiento desconocido")
 
-    valid_moves = VALID_MOVES[movement_card_type]
-
     # Extract the coordinates for the pieces being moved
     x1, y1 = movement.piece_1_coordinates.x, movement.piece_1_coordinates.y
     x2, y2 = movement.piece_2_coordinates.x, movement.piece_2_coordinates.y
 
     # Check if the movement is valid
-    if (x1, y1, x2, y2) not in valid_moves:
+    if not MOVE_TARGETS[movement_card_type][x1 * BOARD_SIZE + y1] >> (x2 * BOARD_SIZE + y2) & 1:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=f"Movimiento invalido")
 
 
+def get_legal_movements(movement_types: List[MovementType], tile: Optional[Coordinate] = None) -> List[LegalMovementSchema]:
+    """
+    Tiles each tile can be swapped with using the given movement cards, or only the ones of tile if given.
+    Tiles without any legal swap are left out.
+    """
+    tiles = range(BOARD_SIZE * BOARD_SIZE) if tile is None else [tile.x * BOARD_SIZE + tile.y]
+    legal_movements = []
+    for movement_type in movement_types:
+        move_targets = MOVE_TARGETS[movement_type.name]
+        for tile_1 in tiles:
+            targets = move_targets[tile_1]
+            if not targets:
+                continue
+            legal_movements.append(LegalMovementSchema.model_construct(
+                movement_type=movement_type,
+                piece_1_coordinates=Coordinate.model_construct(x=tile_1 // BOARD_SIZE, y=tile_1 % BOARD_SIZE),
+                targets=[Coordinate.model_construct(x=tile_2 // BOARD_SIZE, y=tile_2 % BOARD_SIZE)
+                         for tile_2 in range(BOARD_SIZE * BOARD_SIZE) if targets >> tile_2 & 1]))
+    return legal_movements
+
+
 def discard_movement_card(movement: MovementSchema, player: Player, db: Session):
     m_player = db.merge(player)
     movement_card = next((card for card in m_player.movement_cards if card.movement_type ==
@@ -68,9 +86,6 @@ def discard_movement_card(movement: MovementSchema, player: Player, db: Session)
 
     movement_card.in_hand = False
 
-    db.commit()
-    db.refresh(m_player)
-
 
 def reassign_movement_card(movement: Movement, player: Player, db: Session):
     m_player = db.merge(player)
@@ -83,8 +98,16 @@ def reassign_movement_card(movement: Movement, player: Player, db: Session):
 
     movement_card.in_hand = True
 
-    db.commit()
-    db.refresh(m_player)
+def return_movement_card(movement: Movement, player: Player):
+    """Put back in the hand of the player the card used for the movement, without merging the player"""
+    movement_card = next(
+        (card for card in player.movement_cards if card.movement_type == movement.movement_type and not card.in_hand), None)
+
+    if not movement_card:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Movement card not found in player's hand")
+
+    movement_card.in_hand = True
 
 def reassign_all_movement_cards(player: Player, db: Session):
     partial_movements = [
@@ -100,14 +123,11 @@ def make_partial_move(movement: MovementSchema, player: Player, db: Session):
                             x1=movement.piece_1_coordinates.x, y1=movement.piece_1_coordinates.y,
                             x2=movement.piece_2_coordinates.x, y2=movement.piece_2_coordinates.y)
 
+    player.movements.append(partial_move)
     db.add(partial_move)
-    db.commit()
-    db.refresh(partial_move)
 
 
 def delete_movement_cards_not_in_hand (player: Player, db: Session):
-    for movement_card in player.movement_cards:
-        if not movement_card.in_hand:
-            db.delete(movement_card)
-    db.commit()
-    db.refresh(player)
+    for movement_card in [card for card in player.movement_cards if not card.in_hand]:
+        player.movement_cards.remove(movement_card)
+        db.delete(movement_card)
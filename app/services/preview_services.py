@@ -0,0 +1,90 @@
+from app.db.constants import MOVE_TARGETS, BOARD_SIZE, FIGURE_CACHE_SIZE
+from app.db.enums import Colors, MovementType
+from app.models.player_models import Player
+from app.schemas.board_schemas import BoardSchemaOut
+from app.schemas.figure_schema import SwapPreviewSchema
+from app.services.bitboard_services import get_board_fingerprint, tile_to_coordinate, to_figure_schemas, PackedFigure
+from app.services.component_services import FigureIndex, sort_matches
+from app.services.cache_services import LRUCache
+from typing import List, Tuple
+
+# A previewed swap, as (tile 1, tile 2, formed figures, destroyed figures)
+PackedSwapPreview = Tuple[int, int, List[PackedFigure], List[PackedFigure]]
+
+# Packed previews per (board fingerprint, forbidden color, movement type)
+swap_preview_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+def get_movement_types_in_hand(player: Player) -> List[MovementType]:
+    """Movement types of the cards in the player's hand, without repetitions"""
+    movement_types = {card.movement_type for card in player.movement_cards if card.in_hand}
+    return [movement_type for movement_type in MovementType if movement_type in movement_types]
+
+
+def get_swaps(movement_type: MovementType) -> List[Tuple[int, int]]:
+    """
+    Swaps allowed by a movement card, as packed tiles. MOVE_TARGETS has every swap in both directions,
+    only the one that starts from the first tile is kept because both give the same board.
+    """
+    move_targets = MOVE_TARGETS[movement_type.name]
+    return [(tile_1, tile_2) for tile_1 in range(BOARD_SIZE * BOARD_SIZE)
+            for tile_2 in range(tile_1 + 1, BOARD_SIZE * BOARD_SIZE) if move_targets[tile_1] >> tile_2 & 1]
+
+
+def get_figure_changes(figure_index: FigureIndex, swapped_index: FigureIndex,
+                       f_color: Colors) -> Tuple[List[PackedFigure], List[PackedFigure]]:
+    """Figures that are only in the swapped board (formed) and only in the current one (destroyed)"""
+    formed = [match for component, (color, matches) in swapped_index.figures.items()
+              if color != f_color and figure_index.figures.get(component) != (color, matches)
+              for match in matches]
+    destroyed = [match for component, (color, matches) in figure_index.figures.items()
+                 if color != f_color and swapped_index.figures.get(component) != (color, matches)
+                 for match in matches]
+    return sort_matches(formed), sort_matches(destroyed)
+
+
+def preview_swaps(figure_index: FigureIndex, movement_type: MovementType, f_color: Colors) -> List[PackedSwapPreview]:
+    """
+    Figures formed and destroyed by every swap of a movement card.
+    Each swap starts from a copy of the current index, so only the regions around the two tiles are labelled again.
+    """
+    previews = []
+    for tile_1, tile_2 in get_swaps(movement_type):
+        tile_colors = figure_index.tile_colors
+        if tile_colors[tile_1] == tile_colors[tile_2]:
+            previews.append((tile_1, tile_2, [], []))
+            continue
+        swapped_colors = list(tile_colors)
+        swapped_colors[tile_1], swapped_colors[tile_2] = swapped_colors[tile_2], swapped_colors[tile_1]
+        swapped_index = figure_index.copy()
+        swapped_index.update(swapped_colors)
+        previews.append((tile_1, tile_2, *get_figure_changes(figure_index, swapped_index, f_color)))
+    return previews
+
+
+def get_swap_previews(board: BoardSchemaOut, movement_types: List[MovementType], f_color: Colors) -> List[SwapPreviewSchema]:
+    """
+    Every legal swap of the given movement cards on the board, with the figures it would form or destroy.
+    Previews are cached per board state, forbidden color and movement type.
+    """
+    fingerprint = get_board_fingerprint(board)
+    figure_index = None
+    previews = []
+    for movement_type in movement_types:
+        key = (fingerprint, f_color, movement_type)
+        movement_previews = swap_preview_cache.get(key)
+        if movement_previews is None:
+            if figure_index is None:
+                figure_index = FigureIndex()
+                figure_index.update([color for row in board.color_distribution for color in row])
+            movement_previews = preview_swaps(figure_index, movement_type, f_color)
+            swap_preview_cache.put(key, movement_previews)
+
+        previews.extend(SwapPreviewSchema.model_construct(
+            movement_type=movement_type,
+            piece_1_coordinates=tile_to_coordinate(tile_1),
+            piece_2_coordinates=tile_to_coordinate(tile_2),
+            formed_figures=to_figure_schemas(formed),
+            destroyed_figures=to_figure_schemas(destroyed))
+            for tile_1, tile_2, formed, destroyed in movement_previews)
+    return previews
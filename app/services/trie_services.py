@@ -0,0 +1,80 @@
+from app.db.constants import VALID_PATHS, MOVEMENT_STEPS, TEMPORAL_MOVEMENTS, BOARD_SIZE, Movement
+from app.db.enums import Colors, FigTypeAndDifficulty
+from app.services.bitboard_services import tiles_to_mask, PackedFigure
+from app.services.component_services import get_neighbours_mask, sort_matches
+from typing import Dict, List, Optional
+
+
+class PathTrieNode:
+    """
+    Node of the trie of VALID_PATHS. Paths that share their first movements share the nodes
+    of that prefix, so it is walked once for all of them.
+    """
+
+    def __init__(self):
+        self.children: Dict[Movement, PathTrieNode] = {}
+        # (figure index, rotation, figure) of every path that ends in this node
+        self.figures = []
+
+
+def build_path_trie() -> PathTrieNode:
+    order = {fig.value[0]: (index, fig) for index, fig in enumerate(FigTypeAndDifficulty)}
+    root = PathTrieNode()
+    for fig, paths in VALID_PATHS.items():
+        fig_index, fig_type = order[fig]
+        for rotation, path in enumerate(paths):
+            node = root
+            for mov in path:
+                node = node.children.setdefault(mov, PathTrieNode())
+            node.figures.append((fig_index, rotation, fig_type))
+    return root
+
+
+PATH_TRIE = build_path_trie()
+
+
+def build_tile_steps() -> List[Dict[Movement, Optional[int]]]:
+    """Packed tile reached from every tile with every movement, None if it leaves the board"""
+    steps = []
+    for x in range(BOARD_SIZE):
+        for y in range(BOARD_SIZE):
+            tile_steps = {}
+            for mov, (dx, dy) in MOVEMENT_STEPS.items():
+                next_x, next_y = x + dx, y + dy
+                inside = 0 <= next_x < BOARD_SIZE and 0 <= next_y < BOARD_SIZE
+                tile_steps[mov] = next_x * BOARD_SIZE + next_y if inside else None
+            steps.append(tile_steps)
+    return steps
+
+
+TILE_STEPS = build_tile_steps()
+
+
+def get_figures_in_path_trie(tile_colors: List[Colors], masks: Dict[Colors, int], f_color: Colors) -> List[PackedFigure]:
+    """
+    Get all figures in a board given as one color per packed tile, walking the trie once from every start tile.
+    A branch is dropped as soon as it reaches a tile of another color.
+    """
+    matches = []
+    for start, color in enumerate(tile_colors):
+        if color == f_color:
+            continue
+        color_mask = masks[color]
+        pending = [(PATH_TRIE, start, ())]
+        while pending:
+            node, tile, tiles = pending.pop()
+            if node.figures:
+                figure_tiles = tiles + (tile,)
+                mask = tiles_to_mask(figure_tiles)
+                if not get_neighbours_mask(mask) & ~mask & color_mask:
+                    matches.extend((fig_index, rotation, start, fig, figure_tiles)
+                                   for fig_index, rotation, fig in node.figures)
+            for mov, child in node.children.items():
+                next_tile = TILE_STEPS[tile][mov]
+                if next_tile is None or tile_colors[next_tile] != color:
+                    continue
+                if mov in TEMPORAL_MOVEMENTS:
+                    pending.append((child, tile, tiles + (next_tile,)))
+                else:
+                    pending.append((child, next_tile, tiles + (tile,)))
+    return sort_matches(matches)
@@ -1,11 +1,13 @@
 from fastapi import WebSocket, WebSocketException, status
 from fastapi.encoders import jsonable_encoder
-from app.services.figure_services import get_all_figures_in_board
+from app.services.figure_services import get_all_figures_in_board, get_figure_types_to_scan
 from app.services.game_services import convert_game_to_schema
 from app.models.game_models import Game
 from app.dependencies.dependencies import get_game_list
 from app.services.game_services import convert_board_to_schema, calculate_partial_board, get_move_tiles
 from app.models.board_models import Board
+from app.schemas.board_schemas import BoardSchemaOut
+from typing import Awaitable
 import logging
 from app.models.player_models import Player
 
@@ -13,21 +15,44 @@ from app.models.player_models import Player
 class ConnectionManager:
     def __init__(self):
         self.active_connections = set()
+        # Connections that asked for boards packed as 36 character strings
+        self.compact_connections = set()
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, compact: bool = False):
         await websocket.accept()
         self.active_connections.add(websocket)
+        if compact:
+            self.compact_connections.add(websocket)
         
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
+        self.compact_connections.discard(websocket)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         await websocket.send_json(jsonable_encoder(message))
 
-    async def broadcast(self, message: dict):
+    def broadcast(self, message: dict, compact_message: dict = None) -> Awaitable[None]:
+        """
+        Send the message to every connection, or compact_message to the compact ones if given.
+        The messages are encoded right away, the returned coroutine only sends them.
+        """
+        encoded = jsonable_encoder(message)
+        encoded_compact = jsonable_encoder(compact_message) if compact_message is not None else encoded
+        return self.send_encoded(encoded, encoded_compact)
+
+    async def send_encoded(self, encoded: dict, encoded_compact: dict):
         for connection in self.active_connections:
-            await connection.send_json(jsonable_encoder(message))
+            await connection.send_json(encoded_compact if connection in self.compact_connections else encoded)
+
+
+def get_compact_board_message(board: BoardSchemaOut) -> dict:
+    """Board event for the compact connections: the board is packed as a 36 character string"""
+    return {
+        "type": "board",
+        "message": "",
+        "payload": {"packed": board.packed()}
+    }
 
 
 class GameListManager:
@@ -70,55 +95,60 @@ class GameListManager:
 
 
 class GameManager:
+    """
+    Events of a game. The broadcast methods build the event when they are called, in the executor work that
+    changed the game, and return the coroutine that sends it, so the event loop only sends it.
+    """
+
     def __init__(self):
         self.connection_manager = ConnectionManager()
 
-    async def connect(self, websocket: WebSocket):
-        await self.connection_manager.connect(websocket)
+    async def connect(self, websocket: WebSocket, compact: bool = False):
+        await self.connection_manager.connect(websocket, compact=compact)
 
     def disconnect(self, websocket: WebSocket):
         self.connection_manager.disconnect(websocket)
 
 
-    async def broadcast_disconnection(self, game: Game, player_id: int, player_name: str):
+    def broadcast_disconnection(self, game: Game, player_id: int, player_name: str) -> Awaitable[None]:
         game_schema = convert_game_to_schema(game)
         event_message = {
             "type": "player disconnected",
             "message": player_name + " abandonó la partida",
             "payload": game_schema
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_connection(self, game: Game, player_id: int, player_name: str):
+    def broadcast_connection(self, game: Game, player_id: int, player_name: str) -> Awaitable[None]:
         game_schema = convert_game_to_schema(game)
         event_message = {
             "type": "player connected",
             "message": player_name + " se ha unido a la partida",
             "payload": game_schema
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_game(self, game: Game):
+    def broadcast_game(self, game: Game) -> Awaitable[None]:
         game_schema = convert_game_to_schema(game)
         event_message = {
             "payload": game_schema
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_game_start(self, game: Game, player_name: str):
+    def broadcast_game_start(self, game: Game, player_name: str) -> Awaitable[None]:
         game_schema = convert_game_to_schema(game)
         event_message = {
             "type": "game started",
             "message": "Turno de " + player_name,
             "payload": game_schema
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_finish_turn(self, game: Game, player_name: str):
+    def broadcast_finish_turn(self, game: Game, player_name: str) -> Awaitable[None]:
         game_schema = convert_game_to_schema(game)
         event_message = {
             "type": "finish turn",
@@ -126,52 +156,56 @@ class GameManager:
             "payload": game_schema
         }
 
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_game_won(self, game: Game, player: Player):
+    def broadcast_game_won(self, game: Game, player: Player) -> Awaitable[None]:
         event_message = {
             "type": "game won",
             "message": player.name + " ha ganado la partida",
             "payload": {"player_id": player.id}
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message)
 
 
-    async def broadcast_board(self, game: Game):
+    def broadcast_board(self, game: Game) -> Awaitable[None]:
         board_schema = convert_board_to_schema(game)
         event_message = {
             "type": "board",
             "message": "",
             "payload": board_schema
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message, get_compact_board_message(board_schema))
 
 
-    async def broadcast_partial_board(self, game: Game):
+    def broadcast_partial_board(self, game: Game) -> Awaitable[None]:
         color_distribution = calculate_partial_board(game)
         event_message = {
             "type": "board",
             "message": "",
             "payload": color_distribution
         }
-        await self.connection_manager.broadcast(event_message)
+        return self.connection_manager.broadcast(event_message, get_compact_board_message(color_distribution))
 
 
-    async def broadcast_figures_in_board(self, game:Game):
-        figures = get_all_figures_in_board(game)
+    def broadcast_figures_in_board(self, game:Game) -> Awaitable[None]:
+        fig_types = get_figure_types_to_scan(game)
+        figures = get_all_figures_in_board(game, fig_types=fig_types)
         event_message = {
             "type": "figures",
             "message": "",
             "payload": figures
         }
-        await self.connection_manager.broadcast(event_message)     
+        if fig_types is not None:
+            # Only these figure types were looked for
+            event_message["scanned"] = [fig.value[0] for fig in fig_types]
+        return self.connection_manager.broadcast(event_message)     
 
-    async def  broadcast_partial_moves_in_board(self, game:Game):
+    def broadcast_partial_moves_in_board(self, game:Game) -> Awaitable[None]:
         tiles_coord = get_move_tiles(game)
         event_message = {
             "type": "partial_moves",
             "message": "",
             "payload": tiles_coord
         }
-        await self.connection_manager.broadcast(event_message)   
\ No newline at end of file
+        return self.connection_manager.broadcast(event_message)   
\ No newline at end of file
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.db.db import Base, get_db, create_db_engine, create_async_db_engine
+from app.dependencies.dependencies import get_player
+from app.models.player_models import Player
+from app.services.auth_services import verify_token_in_db
+import asyncio
+import pytest
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Sync and async sessions of a new SQLite file, with one player"""
+    path = tmp_path / "switcher.db"
+    engine = create_db_engine(url=f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # Every TestClient request runs in its own event loop, so connections are not pooled
+    async_engine = create_async_db_engine(url=f"sqlite+aiosqlite:///{path}", pool="null")
+    async_session_maker = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    db = session_maker()
+    db.add(Player(name="Juan", token="token-juan", blocked=False))
+    db.commit()
+    db.close()
+
+    yield session_maker, async_session_maker
+    engine.dispose()
+
+
+def test_authenticated_request(database):
+    session_maker, async_session_maker = database
+    db = session_maker()
+    app.dependency_overrides[get_db] = lambda: db
+
+    with patch("app.services.auth_services.AsyncSessionLocal", async_session_maker):
+        response = client.post("/games/", json={"name": "Game", "player_amount": 2},
+                               headers={"Authorization": "Bearer token-juan"})
+
+    assert response.status_code == 200
+    assert response.json()["host_id"] == 1
+    # The player found by the async session was merged into the session of the request
+    assert db.get(Player, 1).game_id == response.json()["id"]
+
+    db.close()
+    app.dependency_overrides = {}
+
+
+def test_authenticated_request_invalid_token(database):
+    _, async_session_maker = database
+
+    with patch("app.services.auth_services.AsyncSessionLocal", async_session_maker):
+        response = client.post("/games/", json={"name": "Game", "player_amount": 2},
+                               headers={"Authorization": "Bearer other"})
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid token"}
+
+
+@pytest.mark.asyncio
+async def test_token_lookup_does_not_block_event_loop(database):
+    _, async_session_maker = database
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(ticker())
+    async with async_session_maker() as db:
+        for _ in range(10):
+            assert (await verify_token_in_db("token-juan", db)).name == "Juan"
+    task.cancel()
+
+    # Other tasks kept running while the queries waited for the database
+    assert ticks > 10
+
+
+def test_get_player(database):
+    session_maker, _ = database
+
+    with session_maker() as db:
+        assert get_player(1, db).name == "Juan"
+
+        with pytest.raises(HTTPException) as error:
+            get_player(2, db)
+        assert error.value.status_code == 404
@@ -1,7 +1,14 @@
 from app.models.board_models import Board
-from app.db.enums import Colors
+from app.db.enums import Colors, MovementType
 from typing import Counter
 from unittest.mock import MagicMock, patch
+from app.models.movement_model import Movement
+from app.services.game_services import (calculate_partial_board, get_partial_board, drop_partial_board, PartialBoard,
+                                        remove_last_partial_movement)
+from app.models.movement_card_model import MovementCard
+from app.db.board_codec import encode_board, decode_board, PackedBoard
+from app.schemas.board_schemas import BoardSchemaOut
+import json
 
 @patch('app.models.board_models.random.shuffle')
 def test_init_board(mocked_random_distribution):
@@ -34,3 +41,153 @@ def test_init_board(mocked_random_distribution):
 
     
 
+
+
+def make_partial_board_game(movements):
+    player = MagicMock()
+    player.id = 1
+    player.movements = movements
+
+    game = MagicMock()
+    game.id = 1
+    game.players = [player]
+    game.player_turn = 0
+    game.board.color_distribution = [[Colors.red.value] * 6 for _ in range(6)]
+    game.board.color_distribution[0][0] = Colors.blue.value
+    return game
+
+
+def test_calculate_partial_board_move_and_undo():
+    first = Movement(id=1, x1=0, y1=0, x2=0, y2=2, final_movement=False)
+    second = Movement(id=2, x1=0, y1=2, x2=2, y2=2, final_movement=False)
+    game = make_partial_board_game([first])
+    drop_partial_board(game.id)
+
+    board = calculate_partial_board(game)
+    assert board.color_distribution[0][2] == Colors.blue
+    assert board.color_distribution[0][0] == Colors.red
+
+    # Adding a movement only swaps its two tiles, the rest of the movements are not replayed
+    game.players[0].movements = [first, second]
+    with patch.object(PartialBoard, "swap", wraps=get_partial_board(game.id).swap) as mock_swap:
+        board = calculate_partial_board(game)
+        mock_swap.assert_called_once_with((2, 0, 2, 2, 2))
+    assert board.color_distribution[2][2] == Colors.blue
+
+    # Undoing the last movement restores the board before it
+    game.players[0].movements = [first]
+    board = calculate_partial_board(game)
+    assert board.color_distribution[0][2] == Colors.blue
+    assert board.color_distribution[2][2] == Colors.red
+
+    # Final movements are not partial anymore
+    first.final_movement = True
+    board = calculate_partial_board(game)
+    assert board.color_distribution[0][0] == Colors.blue
+
+    drop_partial_board(game.id)
+
+
+def test_calculate_partial_board_new_base():
+    game = make_partial_board_game([Movement(id=1, x1=0, y1=0, x2=0, y2=2, final_movement=False)])
+    drop_partial_board(game.id)
+
+    calculate_partial_board(game)
+    version = get_partial_board(game.id).version
+
+    # Reading again does not change the board
+    calculate_partial_board(game)
+    assert get_partial_board(game.id).version == version
+
+    # The figure was discarded: the partial board is now the base board
+    game.board.color_distribution = [[Colors.green.value] * 6 for _ in range(6)]
+    game.players[0].movements = []
+    board = calculate_partial_board(game)
+    assert board.color_distribution == [[Colors.green] * 6 for _ in range(6)]
+
+    # The next partial movement is applied to the new base board
+    game.board.color_distribution[0][0] = Colors.red.value
+    game.players[0].movements = [Movement(id=2, x1=0, y1=0, x2=0, y2=2, final_movement=False)]
+    board = calculate_partial_board(game)
+    assert (board.color_distribution[0][0], board.color_distribution[0][2]) == (Colors.green, Colors.red)
+    assert get_partial_board(game.id).version > version
+
+    drop_partial_board(game.id)
+
+
+def test_remove_last_partial_movement_restores_board():
+    first = Movement(id=1, movement_type=MovementType.MOV_01, x1=0, y1=0, x2=0, y2=2, final_movement=False)
+    second = Movement(id=2, movement_type=MovementType.MOV_02, x1=0, y1=2, x2=2, y2=2, final_movement=False)
+    game = make_partial_board_game([first, second])
+    player = game.players[0]
+    player.movement_cards = [MovementCard(movement_type=MovementType.MOV_01, in_hand=False),
+                             MovementCard(movement_type=MovementType.MOV_02, in_hand=False)]
+    mock_db = MagicMock()
+    drop_partial_board(game.id)
+
+    before = calculate_partial_board(game).color_distribution
+    assert before[2][2] == Colors.blue
+
+    assert remove_last_partial_movement(game, player, mock_db)
+
+    # The board before the movement is restored without replaying or swapping
+    partial_board = get_partial_board(game.id)
+    assert partial_board.movements == [(1, 0, 0, 0, 2)]
+    assert partial_board.board[0][2] == Colors.blue and partial_board.board[2][2] == Colors.red
+    assert player.movements == [first]
+    assert [card.in_hand for card in player.movement_cards] == [False, True]
+    mock_db.delete.assert_called_once_with(second)
+    # The endpoint commits
+    mock_db.commit.assert_not_called()
+    mock_db.merge.assert_not_called()
+
+    with patch.object(PartialBoard, "swap") as mock_swap:
+        calculate_partial_board(game)
+        mock_swap.assert_not_called()
+
+    drop_partial_board(game.id)
+
+
+def test_remove_last_partial_movement_without_board():
+    first = Movement(id=1, movement_type=MovementType.MOV_01, x1=0, y1=0, x2=0, y2=2, final_movement=False)
+    second = Movement(id=2, movement_type=MovementType.MOV_01, x1=0, y1=2, x2=2, y2=2, final_movement=False)
+    game = make_partial_board_game([second, first])
+    player = game.players[0]
+    player.movement_cards = [MovementCard(movement_type=MovementType.MOV_01, in_hand=True),
+                             MovementCard(movement_type=MovementType.MOV_01, in_hand=False)]
+    drop_partial_board(game.id)
+
+    assert remove_last_partial_movement(game, player, MagicMock())
+
+    assert player.movements == [first]
+    assert [card.in_hand for card in player.movement_cards] == [True, True]
+
+    drop_partial_board(game.id)
+
+
+def test_packed_board_roundtrip():
+    board = [[Colors.red, Colors.blue, Colors.yellow, Colors.green, Colors.none, Colors.red] for _ in range(6)]
+
+    packed = encode_board(board)
+    assert packed == "rbygnr" * 6
+    assert decode_board(packed) == board
+    assert encode_board([[color.value for color in row] for row in board]) == packed
+
+
+def test_packed_board_column():
+    column = PackedBoard()
+    board = [[Colors.red.value] * 6 for _ in range(6)]
+
+    stored = column.process_bind_param(board, None)
+    assert stored == "r" * 36
+    assert column.process_result_value(stored, None) == board
+    # Boards stored as JSON before the packed encoding
+    assert column.process_result_value(json.dumps(board), None) == board
+    assert column.process_bind_param(None, None) is None
+
+
+def test_board_schema_from_packed():
+    schema = BoardSchemaOut(color_distribution="g" * 36)
+
+    assert schema.color_distribution == [[Colors.green] * 6 for _ in range(6)]
+    assert schema.packed() == "g" * 36
@@ -0,0 +1,286 @@
+from unittest.mock import MagicMock, patch, AsyncMock
+from collections import defaultdict
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.db.db import Base, get_db, create_db_engine
+from app.db.enums import GameStatus, MovementType, FigTypeAndDifficulty, Colors
+from app.models.game_models import Game
+from app.models.player_models import Player
+from app.models.movement_card_model import MovementCard
+from app.models.figure_card_model import FigureCard
+from app.dependencies.dependencies import get_game
+from app.endpoints.game_endpoints import auth_scheme
+from app.endpoints.bot_endpoints import play_bot_turn, resume_bots
+from app.schemas.figure_schema import HintSchema, HintMovementSchema, FigureInBoardSchema
+from app.schemas.movement_schema import Coordinate
+from app.services.bot_services import BotScheduler, bot_scheduler, plan_bot_turn
+from app.services.websocket_services import GameManager
+import pytest
+import time
+
+client = TestClient(app)
+
+
+def test_add_bots():
+    mock_db = MagicMock()
+    new_ids = iter(range(10, 20))
+
+    def assign_id(player):
+        player.id = next(new_ids)
+    mock_db.add.side_effect = assign_id
+
+    mock_list_players = [Player(id=1, name="Juan", blocked=False)]
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1", status=GameStatus.waiting, host_id=1,
+                     player_turn=0, forbidden_color=Colors.none)
+
+    app.dependency_overrides[get_db] = lambda: mock_db
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[0]
+
+    with patch("app.endpoints.bot_endpoints.game_connection_managers") as mock_manager:
+        mock_manager[mock_game.id].broadcast_connection = AsyncMock(return_value=None)
+
+        response = client.put("/games/1/bots")
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Se agregaron 2 bots a la partida"
+    assert [player.name for player in mock_game.players] == ["Juan", "Bot 2", "Bot 3"]
+    assert mock_game.status == GameStatus.full
+    assert [player.bot for player in mock_game.players[1:]] == [True, True]
+    assert bot_scheduler.is_bot(1, 10) and bot_scheduler.is_bot(1, 11)
+    assert not bot_scheduler.is_bot(1, 1)
+
+    bot_scheduler.remove_game(1)
+    app.dependency_overrides = {}
+
+
+def test_add_bots_not_host_fail():
+    mock_list_players = [Player(id=1, name="Juan"), Player(id=2, name="Pedro")]
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1", status=GameStatus.waiting, host_id=1)
+
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[1]
+
+    response = client.put("/games/1/bots")
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Solo el host puede agregar bots"}
+
+    app.dependency_overrides = {}
+
+
+@pytest.mark.asyncio
+async def test_bot_scheduler_plays_each_game_once():
+    scheduler = BotScheduler(cpu_share=1)
+    scheduler.play_turn = AsyncMock(return_value=None)
+    scheduler.add_bot(1, 10)
+    scheduler.add_bot(2, 20)
+
+    scheduler.notify(1)
+    scheduler.notify(1)
+    scheduler.notify(2)
+    # Games without bots are never queued
+    scheduler.notify(3)
+    await scheduler.task
+
+    assert [call.args for call in scheduler.play_turn.call_args_list] == [(1,), (2,)]
+
+
+@pytest.mark.asyncio
+async def test_bot_scheduler_keeps_running_after_a_failed_turn():
+    scheduler = BotScheduler(cpu_share=1)
+    scheduler.play_turn = AsyncMock(side_effect=[Exception("boom"), None])
+    scheduler.add_bot(1, 10)
+    scheduler.add_bot(2, 20)
+
+    scheduler.notify(1)
+    scheduler.notify(2)
+    await scheduler.task
+
+    assert scheduler.play_turn.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_bot_scheduler_budgets_the_cpu_time():
+    scheduler = BotScheduler(cpu_share=0.25)
+    # The turn took long waiting for the game, but only used 10 ms of CPU
+    scheduler.play_turn = AsyncMock(side_effect=[0.01, None])
+    scheduler.add_bot(1, 10)
+    scheduler.add_bot(2, 20)
+
+    with patch("app.services.bot_services.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        scheduler.notify(1)
+        scheduler.notify(2)
+        await scheduler.task
+
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [pytest.approx(0.03), 0]
+
+
+def test_plan_bot_turn():
+    board = [[Colors.red if (x + y) % 2 == 0 else Colors.blue for y in range(6)] for x in range(6)]
+    board[0][0:3] = [Colors.green] * 3
+    board[2][1] = Colors.green
+
+    bot = MagicMock(spec=Player)
+    bot.movements = []
+    bot.movement_cards = [MovementCard(movement_type=MovementType.MOV_01, in_hand=True)]
+    bot.figure_cards = [FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_06, in_hand=True, blocked=False)]
+
+    game = MagicMock(spec=Game)
+    game.board.color_distribution = board
+    game.players = [bot]
+    game.player_turn = 0
+    game.forbidden_color = Colors.none
+
+    plan = plan_bot_turn(game, bot)
+
+    assert plan.figure.fig == FigTypeAndDifficulty.FIGE_06
+    assert len(plan.movements) == 1
+
+
+def test_plan_bot_turn_last_blocked_card():
+    board = [[Colors.red if (x + y) % 2 == 0 else Colors.blue for y in range(6)] for x in range(6)]
+    board[0][0:4] = [Colors.green] * 4
+
+    bot = MagicMock(spec=Player)
+    bot.movements = []
+    bot.movement_cards = [MovementCard(movement_type=MovementType.MOV_01, in_hand=True)]
+    # A blocked card can be discarded once it is the last one
+    bot.figure_cards = [FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_06, in_hand=True, blocked=True)]
+
+    game = MagicMock(spec=Game)
+    game.board.color_distribution = board
+    game.players = [bot]
+    game.player_turn = 0
+    game.forbidden_color = Colors.none
+
+    plan = plan_bot_turn(game, bot)
+
+    assert plan.figure.fig == FigTypeAndDifficulty.FIGE_06
+    assert plan.movements == []
+
+
+@pytest.mark.asyncio
+async def test_play_bot_turn():
+    bot = Player(id=10, name="Bot 2")
+    mock_game = Game(id=1, players=[Player(id=1, name="Juan"), bot], player_amount=2, name="Game 1",
+                     status=GameStatus.in_game, host_id=1, player_turn=1)
+    plan = HintSchema(
+        figure=FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=0, y=y) for y in range(4)]),
+        movements=[HintMovementSchema(movement_type=MovementType.MOV_01,
+                                      piece_1_coordinates=Coordinate(x=0, y=3), piece_2_coordinates=Coordinate(x=2, y=1))],
+        timed_out=False)
+
+    bot_scheduler.add_bot(1, 10)
+
+    with patch("app.endpoints.bot_endpoints.SessionLocal") as mock_session, \
+            patch("app.endpoints.bot_endpoints.plan_bot_turn", return_value=plan), \
+            patch("app.endpoints.bot_endpoints.add_movement_sync") as mock_add_movement, \
+            patch("app.endpoints.bot_endpoints.discard_figure_card_sync") as mock_discard, \
+            patch("app.endpoints.bot_endpoints.finish_turn_sync") as mock_finish_turn:
+        mock_db = mock_session.return_value
+        mock_db.query.return_value.options.return_value.filter.return_value.first.return_value = mock_game
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_game
+        mock_db.get.return_value = bot
+
+        await play_bot_turn(1)
+
+        movement = mock_add_movement.call_args.kwargs["movement"]
+        assert movement.movement_card.movement_type == MovementType.MOV_01
+        assert movement.piece_1_coordinates == Coordinate(x=0, y=3)
+
+        discard = mock_discard.call_args.kwargs["figure_to_discard"]
+        assert (discard.figure_card, discard.clicked_x, discard.clicked_y) == ("fige06", 0, 0)
+
+        mock_finish_turn.assert_called_once()
+        assert mock_finish_turn.call_args.kwargs["player"] is bot
+        # Every step opens its own session, like a request
+        assert mock_session.call_count == 4
+        assert mock_db.close.call_count == 4
+
+    bot_scheduler.remove_game(1)
+
+
+@pytest.mark.asyncio
+async def test_play_bot_turn_human_in_turn():
+    mock_game = Game(id=1, players=[Player(id=1, name="Juan"), Player(id=10, name="Bot 2")], player_amount=2,
+                     name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=0)
+
+    bot_scheduler.add_bot(1, 10)
+
+    with patch("app.endpoints.bot_endpoints.SessionLocal") as mock_session, \
+            patch("app.endpoints.bot_endpoints.finish_turn_sync") as mock_finish_turn:
+        mock_session.return_value.query.return_value.options.return_value.filter.return_value.first.return_value = mock_game
+
+        await play_bot_turn(1)
+
+        mock_finish_turn.assert_not_called()
+
+    bot_scheduler.remove_game(1)
+
+
+def test_start_game_with_bots(tmp_path):
+    engine = create_db_engine(url=f"sqlite:///{tmp_path / 'switcher.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_maker = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    with session_maker() as db:
+        host = Player(name="Juan", blocked=False)
+        db.add(host)
+        db.commit()
+
+    def get_test_db():
+        with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[auth_scheme] = lambda: host
+
+    # The bots are notified from the event loop of the requests, after the work in the executor
+    with TestClient(app) as loop_client, \
+            patch.object(bot_scheduler, "play_turn", AsyncMock(return_value=None)) as mock_play_turn, \
+            patch("app.endpoints.game_endpoints.game_connection_managers", defaultdict(GameManager)), \
+            patch("app.endpoints.bot_endpoints.game_connection_managers", defaultdict(GameManager)):
+        game_id = loop_client.post("/games/", json={"name": "Game", "player_amount": 3}).json()["id"]
+        assert loop_client.put(f"/games/{game_id}/bots").status_code == 200
+
+        response = loop_client.put(f"/games/{game_id}/start")
+        assert response.status_code == 200
+
+        deadline = time.monotonic() + 5
+        while not mock_play_turn.await_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        mock_play_turn.assert_awaited_with(game_id)
+
+    bot_scheduler.remove_game(game_id)
+    app.dependency_overrides = {}
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_resume_bots(tmp_path):
+    engine = create_db_engine(url=f"sqlite:///{tmp_path / 'switcher.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_maker() as db:
+        in_game = Game(name="Game 1", player_amount=2, status=GameStatus.in_game, player_turn=0, host_id=1)
+        waiting = Game(name="Game 2", player_amount=2, status=GameStatus.waiting, host_id=3)
+        db.add_all([in_game, waiting])
+        db.commit()
+        db.add_all([Player(name="Juan", game_id=in_game.id), Player(name="Bot 2", game_id=in_game.id, bot=True),
+                    Player(name="Pedro", game_id=waiting.id), Player(name="Bot 2", game_id=waiting.id, bot=True)])
+        db.commit()
+
+    # The scheduler starts empty after a restart, the bots are read from the database
+    with patch("app.endpoints.bot_endpoints.SessionLocal", session_maker), \
+            patch.object(bot_scheduler, "notify") as mock_notify:
+        await resume_bots()
+
+    assert bot_scheduler.is_bot(1, 2) and bot_scheduler.is_bot(2, 4)
+    assert not bot_scheduler.is_bot(1, 1) and not bot_scheduler.is_bot(2, 3)
+    mock_notify.assert_called_once_with(1)
+
+    bot_scheduler.remove_game(1)
+    bot_scheduler.remove_game(2)
+    engine.dispose()
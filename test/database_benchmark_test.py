@@ -0,0 +1,102 @@
+"""
+Database benchmark.
+
+Concurrent players make moves against a SQLite file: each move, like add_movement, adds a partial movement and takes
+the card from the hand in one commit, then reads the player's partial movements back to build the board.
+The best moves/second of every SQLite profile are compared with SQLite's default settings. The comparison is only
+run as a script: the cost of a sync depends on the disk, and is close to nothing on tmpfs, so the tests only check
+the PRAGMAs of each profile.
+
+Run it as a script to print the numbers:
+    PYTHONPATH=. python test/database_benchmark_test.py
+"""
+from app.db.db import Base, create_db_engine, SQLITE_PROFILES
+from app.db.enums import MovementType
+from app.models.game_models import Game
+from app.models.board_models import Board
+from app.models.player_models import Player
+from app.models.movement_model import Movement
+from app.models.movement_card_model import MovementCard
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+import os
+import tempfile
+import time
+
+BENCHMARK_PLAYERS = 8
+BENCHMARK_MOVES = 25
+BENCHMARK_REPEATS = 3
+
+
+def make_database(directory: str, profile: str) -> sessionmaker:
+    """New SQLite file with the profile, and one player with a movement card per benchmark player"""
+    engine = create_db_engine(url=f"sqlite:///{os.path.join(directory, profile)}.db", sqlite_profile=profile,
+                              pool_size=BENCHMARK_PLAYERS)
+    Base.metadata.create_all(bind=engine)
+    session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_maker()
+    for index in range(BENCHMARK_PLAYERS):
+        player = Player(name=f"Player {index}", blocked=False)
+        player.movement_cards.append(MovementCard(movement_type=MovementType.MOV_01, in_hand=True))
+        db.add(player)
+    db.commit()
+    db.close()
+    return session_maker
+
+
+def play_moves(session_maker: sessionmaker, player_id: int, moves: int):
+    for _ in range(moves):
+        db = session_maker()
+        try:
+            card = db.query(MovementCard).filter(MovementCard.associated_player == player_id).first()
+            card.in_hand = not card.in_hand
+            db.add(Movement(player_id=player_id, movement_type=MovementType.MOV_01, final_movement=False,
+                            x1=0, y1=0, x2=2, y2=2))
+            db.commit()
+            db.query(Movement).filter(Movement.player_id == player_id, Movement.final_movement == False).all()
+        finally:
+            db.close()
+
+
+def measure_moves(session_maker: sessionmaker, players: int = BENCHMARK_PLAYERS, moves: int = BENCHMARK_MOVES) -> float:
+    """Moves/second of players making moves at the same time"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=players) as executor:
+        for future in [executor.submit(play_moves, session_maker, player_id, moves) for player_id in range(1, players + 1)]:
+            future.result()
+    return players * moves / (time.perf_counter() - start)
+
+
+def run_benchmark(directory: str, repeats: int = BENCHMARK_REPEATS) -> Dict[str, float]:
+    """Best moves/second of each profile"""
+    results = {}
+    for profile in SQLITE_PROFILES:
+        session_maker = make_database(directory, profile)
+        results[profile] = max(measure_moves(session_maker) for _ in range(repeats))
+    return results
+
+
+def test_tuned_profile_pragmas(tmp_path):
+    session_maker = make_database(str(tmp_path), "tuned")
+
+    with session_maker() as db:
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert db.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_default_profile_pragmas(tmp_path):
+    session_maker = make_database(str(tmp_path), "default")
+
+    with session_maker() as db:
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_benchmark(directory)
+    for profile, value in results.items():
+        print(f"{profile:20} {value:10.1f} moves/s {value / results['default']:8.1f}x")
@@ -0,0 +1,112 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.executor_services import GameExecutor, create_task
+import asyncio
+import threading
+import time
+import pytest
+
+client = TestClient(app)
+
+
+@pytest.mark.asyncio
+async def test_game_work_runs_in_order():
+    executor = GameExecutor(max_workers=4)
+    order = []
+
+    def work(index: int, seconds: float):
+        time.sleep(seconds)
+        order.append(index)
+
+    # The first work is the slowest, but the others of the game wait for it
+    await asyncio.gather(*(executor.run(1, work, index, 0.05 - index * 0.01) for index in range(5)))
+
+    assert order == [0, 1, 2, 3, 4]
+    assert executor.info()["games"] == 0
+
+
+@pytest.mark.asyncio
+async def test_different_games_run_at_the_same_time():
+    executor = GameExecutor(max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    # Both works wait for each other, so they only finish if they run at the same time
+    await asyncio.gather(executor.run(1, barrier.wait), executor.run(2, barrier.wait))
+
+    assert executor.info()["completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_executor_info():
+    executor = GameExecutor(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    works = [asyncio.ensure_future(executor.run(1, block)) for _ in range(3)]
+    await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+    assert executor.info() == {"workers": 1, "running": 1, "queued": 2, "completed": 0,
+                               "games": 1, "max_game_queue": 3}
+
+    release.set()
+    await asyncio.gather(*works)
+
+    assert executor.info() == {"workers": 1, "running": 0, "queued": 0, "completed": 3,
+                               "games": 0, "max_game_queue": 0}
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_created_after_the_work():
+    executor = GameExecutor(max_workers=1)
+    events = []
+
+    async def broadcast():
+        events.append(("broadcast", threading.current_thread() is threading.main_thread()))
+
+    def work():
+        create_task(broadcast())
+        time.sleep(0.01)
+        events.append(("work", threading.current_thread() is threading.main_thread()))
+
+    await executor.run(1, work)
+    await asyncio.sleep(0)
+
+    # The broadcast runs on the event loop once the work in the pool finished
+    assert events == [("work", False), ("broadcast", True)]
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_dropped_when_the_work_fails():
+    executor = GameExecutor(max_workers=1)
+    events = []
+
+    async def broadcast():
+        events.append("broadcast")
+
+    coroutines = []
+
+    def work():
+        coroutines.append(broadcast())
+        create_task(coroutines[0])
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        await executor.run(1, work)
+    await asyncio.sleep(0)
+
+    # The work failed, so its events are never sent, and their coroutines are closed instead of left unawaited
+    assert events == []
+    assert coroutines[0].cr_frame is None
+    assert executor.info()["completed"] == 1
+
+
+def test_get_metrics():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"executor", "figure_cache", "swap_preview_cache"}
+    assert set(response.json()["executor"]) == {"workers", "running", "queued", "completed", "games", "max_game_queue"}
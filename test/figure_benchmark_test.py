@@ -0,0 +1,264 @@
+"""
+Figure detection benchmark.
+
+Every engine is checked against a copy of the original path walker over seeded random boards, with every
+forbidden color, and its throughput (boards/second) is compared with the walker's. The test fails if the
+speedup over the walker drops below BENCHMARK_TOLERANCE times the one stored in the baseline file.
+
+Run it as a script to print the numbers, or to store a new baseline:
+    PYTHONPATH=. python test/figure_benchmark_test.py [--update-baseline]
+"""
+from unittest.mock import MagicMock
+from app.db.constants import VALID_PATHS, Movement
+from app.db.enums import FigTypeAndDifficulty, Colors, FigureEngine
+from app.models.game_models import Game
+from app.models.player_models import Player
+from app.schemas.board_schemas import BoardSchemaOut
+from app.schemas.figure_schema import FigureInBoardSchema
+from app.schemas.movement_schema import Coordinate
+from app.services.figure_services import get_figure_in_board, get_all_figures_in_board, figure_cache
+from app.services.component_services import drop_figure_index
+from app.services.batch_figure_services import get_figures_in_boards, boards_to_codes, COLOR_CODES
+from typing import Callable, Dict, List
+import json
+import os
+import random
+import sys
+import time
+import pytest
+
+BENCHMARK_SEED = 2024
+BENCHMARK_BOARDS = 10
+BENCHMARK_REPEATS = 3
+BENCHMARK_MIN_TIME = 0.1
+BENCHMARK_TOLERANCE = 0.5
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "figure_benchmark_baseline.json")
+
+BENCHMARK_GAME_ID = -1
+
+
+def generate_boards(amount: int, seed: int = BENCHMARK_SEED) -> List[BoardSchemaOut]:
+    """Random boards with the same distribution as Board.__init__: 9 tiles of each color, shuffled"""
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(amount):
+        colors = [Colors.red] * 9 + [Colors.blue] * 9 + [Colors.yellow] * 9 + [Colors.green] * 9
+        rng.shuffle(colors)
+        boards.append(BoardSchemaOut(color_distribution=[colors[i:i + 6] for i in range(0, 36, 6)]))
+    return boards
+
+
+# Original path walker, kept as the reference every engine has to agree with
+
+def reference_is_figure_isolated(tiles: List[Coordinate], board: BoardSchemaOut) -> bool:
+    for tile in tiles:
+        if tile.y > 0:
+            if board.color_distribution[tile.x][tile.y-1] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x, y=tile.y - 1) not in tiles:
+                return False
+        if tile.y < len(board.color_distribution) - 1:
+            if board.color_distribution[tile.x][tile.y+1] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x, y=tile.y + 1) not in tiles:
+                return False
+        if tile.x > 0:
+            if board.color_distribution[tile.x-1][tile.y] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x - 1, y=tile.y) not in tiles:
+                return False
+        if tile.x < len(board.color_distribution[0]) - 1:
+            if board.color_distribution[tile.x+1][tile.y] == board.color_distribution[tile.x][tile.y] and Coordinate(x=tile.x + 1, y=tile.y) not in tiles:
+                return False
+    return True
+
+
+def reference_get_path_valid(path: List[Movement], board: BoardSchemaOut, start: Coordinate, f_color: Colors) -> List[Coordinate]:
+    current_tile = start
+    actual_board = board.color_distribution
+    if actual_board[current_tile.x][current_tile.y] == f_color:
+        return []
+    valid_path = []
+    for mov in path:
+        if mov in (Movement.UP, Movement.TUP) and current_tile.x > 0:
+            next_tile = Coordinate(x=current_tile.x-1, y=current_tile.y)
+        elif mov in (Movement.DOWN, Movement.TDOWN) and current_tile.x < len(actual_board[0]) - 1:
+            next_tile = Coordinate(x=current_tile.x+1, y=current_tile.y)
+        elif mov in (Movement.LEFT, Movement.TLEFT) and current_tile.y > 0:
+            next_tile = Coordinate(x=current_tile.x, y=current_tile.y - 1)
+        elif mov in (Movement.RIGHT, Movement.TRIGHT) and current_tile.y < len(actual_board) - 1:
+            next_tile = Coordinate(x=current_tile.x, y=current_tile.y + 1)
+        else:
+            return []
+        if actual_board[next_tile.x][next_tile.y] == actual_board[current_tile.x][current_tile.y]:
+            if mov in (Movement.UP, Movement.DOWN, Movement.LEFT, Movement.RIGHT):
+                valid_path.append(current_tile)
+                current_tile = next_tile
+            else:
+                valid_path.append(next_tile)
+        else:
+            return []
+    valid_path.append(current_tile)
+    return valid_path
+
+
+def reference_get_figure_in_board(figure_type: tuple, board: BoardSchemaOut, f_color: Colors) -> List[FigureInBoardSchema]:
+    figures = []
+    for path in VALID_PATHS[figure_type[0]]:
+        for x in range(6):
+            for y in range(6):
+                valid_fig = reference_get_path_valid(path=path, board=board, start=Coordinate(x=x, y=y), f_color=f_color)
+                if valid_fig and reference_is_figure_isolated(valid_fig, board):
+                    figures.append(FigureInBoardSchema(fig=figure_type, tiles=valid_fig))
+    return figures
+
+
+def reference_get_all_figures_in_board(board: BoardSchemaOut, f_color: Colors) -> List[FigureInBoardSchema]:
+    figures = []
+    for fig in FigTypeAndDifficulty:
+        figures.extend(reference_get_figure_in_board(fig.value, board, f_color))
+    return figures
+
+
+# Games are reused across repeats so building the mocks is not measured
+games: Dict[tuple, Game] = {}
+
+
+def make_game(board: BoardSchemaOut, f_color: Colors) -> Game:
+    """Game whose partial board is the given board"""
+    if (id(board), f_color) in games:
+        return games[(id(board), f_color)]
+    game = MagicMock(spec=Game)
+    game.id = BENCHMARK_GAME_ID
+    game.board = board
+    game.forbidden_color = f_color
+    game.player_turn = 0
+    player = MagicMock(spec=Player)
+    player.movements = []
+    player.figure_cards = []
+    game.players = [player]
+    games[(id(board), f_color)] = game
+    return game
+
+
+def detect_single(board: BoardSchemaOut, f_color: Colors) -> List[FigureInBoardSchema]:
+    """Every figure of the board, asking for one figure type at a time"""
+    figure_cache.clear()
+    figures = []
+    for fig in FigTypeAndDifficulty:
+        figures.extend(get_figure_in_board(fig.value, board, f_color))
+    return figures
+
+
+def detect_all(engine: FigureEngine) -> Callable[[BoardSchemaOut, Colors], List[FigureInBoardSchema]]:
+    def detect(board: BoardSchemaOut, f_color: Colors) -> List[FigureInBoardSchema]:
+        figure_cache.clear()
+        return get_all_figures_in_board(make_game(board, f_color), engine=engine)
+    return detect
+
+
+DETECTORS: Dict[str, Callable[[BoardSchemaOut, Colors], List[FigureInBoardSchema]]] = {
+    "get_figure_in_board": detect_single,
+    **{f"get_all_figures_in_board[{engine.value}]": detect_all(engine) for engine in FigureEngine},
+}
+
+
+def time_rounds(run: Callable[[], None]) -> float:
+    """
+    Seconds per call of run, best of BENCHMARK_REPEATS. Each repeat calls it for at least BENCHMARK_MIN_TIME,
+    so fast detectors are not timed over a few milliseconds only.
+    """
+    start = time.perf_counter()
+    run()
+    rounds = max(1, int(BENCHMARK_MIN_TIME / max(time.perf_counter() - start, 1e-9)))
+    best = None
+    for _ in range(BENCHMARK_REPEATS):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            run()
+        elapsed = (time.perf_counter() - start) / rounds
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(detect: Callable[[BoardSchemaOut, Colors], list], boards: List[BoardSchemaOut]) -> float:
+    """Boards per second over every board and forbidden color"""
+    def run():
+        for board in boards:
+            for f_color in Colors:
+                detect(board, f_color)
+
+    elapsed = time_rounds(run)
+    drop_figure_index(BENCHMARK_GAME_ID)
+    return len(boards) * len(Colors) / elapsed
+
+
+def measure_batch(boards: List[BoardSchemaOut]) -> float:
+    codes = boards_to_codes(boards)
+
+    def run():
+        for f_color in Colors:
+            get_figures_in_boards(codes, COLOR_CODES[f_color])
+
+    return len(boards) * len(Colors) / time_rounds(run)
+
+
+def run_benchmark(boards: List[BoardSchemaOut]) -> Dict[str, Dict[str, float]]:
+    """Throughput of the reference walker and of every detector, and each detector's speedup over the walker"""
+    reference = measure(reference_get_all_figures_in_board, boards)
+    throughput = {name: measure(detect, boards) for name, detect in DETECTORS.items()}
+    throughput["get_figures_in_boards"] = measure_batch(boards)
+    return {
+        "reference": reference,
+        "throughput": throughput,
+        "speedup": {name: value / reference for name, value in throughput.items()},
+    }
+
+
+@pytest.fixture(scope="module")
+def boards():
+    return generate_boards(BENCHMARK_BOARDS)
+
+
+@pytest.fixture(scope="module")
+def reference_figures(boards):
+    return {(index, f_color): reference_get_all_figures_in_board(board, f_color)
+            for index, board in enumerate(boards) for f_color in Colors}
+
+
+@pytest.mark.parametrize("name", DETECTORS)
+def test_detector_matches_reference(name, boards, reference_figures):
+    detect = DETECTORS[name]
+    for index, board in enumerate(boards):
+        for f_color in Colors:
+            assert detect(board, f_color) == reference_figures[(index, f_color)], (name, index, f_color)
+    drop_figure_index(BENCHMARK_GAME_ID)
+    figure_cache.clear()
+
+
+def test_batch_matches_reference(boards, reference_figures):
+    codes = boards_to_codes(boards)
+    for f_color in Colors:
+        figures = get_figures_in_boards(codes, COLOR_CODES[f_color])
+        for index in range(len(boards)):
+            assert figures[index] == reference_figures[(index, f_color)], (index, f_color)
+
+
+def test_throughput_baseline(boards):
+    with open(BASELINE_PATH) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    results = run_benchmark(boards)
+    figure_cache.clear()
+
+    for name, speedup in baseline["speedup"].items():
+        assert results["speedup"][name] >= speedup * BENCHMARK_TOLERANCE, (
+            f"{name} regressed: {results['speedup'][name]:.1f}x the reference walker, baseline {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    results = run_benchmark(generate_boards(BENCHMARK_BOARDS))
+    print(f"{'reference walker':45} {results['reference']:10.1f} boards/s")
+    for name, value in results["throughput"].items():
+        print(f"{name:45} {value:10.1f} boards/s {results['speedup'][name]:8.1f}x")
+
+    if "--update-baseline" in sys.argv:
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump({"seed": BENCHMARK_SEED, "boards": BENCHMARK_BOARDS,
+                       "speedup": {name: round(value, 1) for name, value in results["speedup"].items()}},
+                      baseline_file, indent=4)
+            baseline_file.write("\n")
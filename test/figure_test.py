@@ -2,11 +2,21 @@ from unittest.mock import MagicMock, patch
 from app.models.game_models import Game
 from app.models.player_models import Player
 from app.models.figure_card_model import FigureCard
-from app.services.figure_services import get_all_figures_in_board
-from app.db.enums import FigTypeAndDifficulty, Colors
+from app.services.figure_services import (get_all_figures_in_board, get_path_valid, get_figure_in_board, is_figure_isolated, get_figure_at_tile,
+                                          get_figure_types_in_hands, figure_cache)
+from app.services.cache_services import LRUCache
+from app.services.bitboard_services import get_color_masks, get_figure_in_color_masks, tile_bit, tiles_to_mask, PLACEMENT_MASKS
+from app.services.component_services import get_components, FigureIndex
+from app.services.trie_services import PATH_TRIE
+from app.services.hint_services import get_hint
+from app.services.batch_figure_services import get_figures_in_boards, COLOR_CODES
+import numpy as np
+from app.db.enums import FigTypeAndDifficulty, Colors, FigureEngine, MovementType
+from app.db.constants import FIG17_0, FIGE6_1, PATH_PLACEMENTS, VALID_PATHS
 from app.models.board_models import Board
 from app.schemas.movement_schema import Coordinate
 from app.schemas.figure_schema import FigureInBoardSchema
+from app.schemas.board_schemas import BoardSchemaOut
 import pytest
 
 
@@ -305,4 +315,324 @@ def test_get_figures_in_board_fc(mock_game_3):
         response = convert_tiles_to_set(response)
         expected_response = convert_tiles_to_set(expected_response)
 
-        assert response == expected_response
\ No newline at end of file
+        assert response == expected_response
+
+def test_get_color_masks():
+    """
+    Each tile sets exactly one bit, in the mask of its color.
+    """
+    board = MagicMock(spec=Board)
+    board.color_distribution = [[Colors.red] * 6 for _ in range(6)]
+    board.color_distribution[0][1] = Colors.blue
+    board.color_distribution[5][5] = Colors.blue
+
+    masks = get_color_masks(board)
+
+    assert masks[Colors.blue] == tile_bit(0, 1) | tile_bit(5, 5)
+    assert masks[Colors.red] == (1 << 36) - 1 - masks[Colors.blue]
+
+
+def test_placement_masks_fig05():
+    """
+    fig05 is the straight pentomino: 2 positions per row and 2 per column.
+    The border of a horizontal line in the top row is the 5 tiles below it plus the tile to its right.
+    """
+    placements = PLACEMENT_MASKS["fig05"]
+    assert len(placements) == 24
+
+    tiles, mask, border = placements[0]
+    assert tiles == (0, 1, 2, 3, 4)
+    assert mask == sum(tile_bit(0, y) for y in range(5))
+    assert border == tile_bit(0, 5) | sum(tile_bit(1, y) for y in range(5))
+
+
+def test_path_placements_out_of_board():
+    """
+    A vertical line of 4 only fits starting on the first 3 rows, so no placement exists for the other starts.
+    """
+    placements = PATH_PLACEMENTS[tuple(FIGE6_1)]
+    assert len(placements) == 18
+    assert 3 * 6 not in placements
+    assert placements[0][0] == (0, 6, 12, 18)
+    assert placements[0][1] == frozenset({1, 7, 13, 19, 24})
+
+
+def test_get_path_valid_temporal_moves():
+    """
+    fig17 (the cross) uses temporal moves. The tiles come back in walking order, and a tile of another color breaks the path.
+    """
+    board = MagicMock(spec=Board)
+    board.color_distribution = [[Colors.green] * 6 for _ in range(6)]
+    for x, y in [(1, 0), (1, 1), (0, 1), (1, 2), (2, 1)]:
+        board.color_distribution[x][y] = Colors.red
+
+    response = get_path_valid(FIG17_0, board, Coordinate(x=1, y=0), Colors.none)
+    assert response == [Coordinate(x=1, y=0), Coordinate(x=0, y=1), Coordinate(x=1, y=2), Coordinate(x=2, y=1), Coordinate(x=1, y=1)]
+
+    assert get_path_valid(FIG17_0, board, Coordinate(x=1, y=0), Colors.red) == []
+    assert get_path_valid(FIG17_0, board, Coordinate(x=0, y=0), Colors.none) == []
+
+
+def test_get_components():
+    """
+    Regions are split by color only, never wrapping around the board edges.
+    """
+    color_mask = tile_bit(0, 5) | tile_bit(1, 0) | tile_bit(2, 0) | tile_bit(2, 1) | tile_bit(5, 5)
+
+    components = get_components(color_mask)
+
+    assert components == [tile_bit(0, 5), tile_bit(1, 0) | tile_bit(2, 0) | tile_bit(2, 1), tile_bit(5, 5)]
+
+
+def test_get_figures_in_board_components_engine(mock_game_2):
+    """
+    The components engine finds the same figures, in the same order, as the default engine.
+    """
+    mock_board = MagicMock(spec=Board)
+    mock_board.color_distribution = [[Colors.yellow, Colors.green, Colors.green, Colors.green, Colors.red, Colors.blue],
+                  [Colors.yellow, Colors.yellow, Colors.green, Colors.green, Colors.red, Colors.blue],
+                  [Colors.yellow, Colors.yellow, Colors.blue, Colors.blue, Colors.red, Colors.blue],
+                  [Colors.blue, Colors.red, Colors.yellow, Colors.yellow, Colors.red, Colors.blue],
+                  [Colors.red, Colors.red, Colors.red, Colors.yellow, Colors.green, Colors.blue],
+                  [Colors.blue, Colors.red, Colors.yellow, Colors.yellow, Colors.green, Colors.green]]
+
+    mock_game_2.board = mock_board
+    with patch('app.services.figure_services.calculate_partial_board') as mock_calculate_partial_board:
+        mock_calculate_partial_board.return_value = mock_board
+        figure_cache.clear()
+        expected_response = get_all_figures_in_board(mock_game_2, engine=FigureEngine.bitboard)
+        figure_cache.clear()
+        response = get_all_figures_in_board(mock_game_2, engine=FigureEngine.components)
+
+        assert len(response) == 6
+        assert response == expected_response
+
+
+def test_path_trie_shared_prefixes():
+    """
+    Every path ends in a node of the trie, and paths with the same first movements share their nodes.
+    """
+    def count_nodes(node):
+        return 1 + sum(count_nodes(child) for child in node.children.values())
+
+    paths = [path for fig_paths in VALID_PATHS.values() for path in fig_paths]
+    for fig, fig_paths in VALID_PATHS.items():
+        for rotation, path in enumerate(fig_paths):
+            node = PATH_TRIE
+            for mov in path:
+                node = node.children[mov]
+            assert any(entry[1] == rotation and entry[2].value[0] == fig for entry in node.figures)
+
+    assert count_nodes(PATH_TRIE) - 1 < sum(len(path) for path in paths)
+
+
+def test_get_figures_in_board_trie_engine(mock_game_2):
+    """
+    The trie engine finds the same figures, in the same order, as the bitboard engine.
+    """
+    mock_board = MagicMock(spec=Board)
+    mock_board.color_distribution = [[Colors.yellow, Colors.green, Colors.green, Colors.green, Colors.red, Colors.blue],
+                  [Colors.yellow, Colors.yellow, Colors.green, Colors.green, Colors.red, Colors.blue],
+                  [Colors.yellow, Colors.yellow, Colors.blue, Colors.blue, Colors.red, Colors.blue],
+                  [Colors.blue, Colors.red, Colors.yellow, Colors.yellow, Colors.red, Colors.blue],
+                  [Colors.red, Colors.red, Colors.red, Colors.yellow, Colors.green, Colors.blue],
+                  [Colors.blue, Colors.red, Colors.yellow, Colors.yellow, Colors.green, Colors.green]]
+
+    mock_game_2.board = mock_board
+    with patch('app.services.figure_services.calculate_partial_board') as mock_calculate_partial_board:
+        mock_calculate_partial_board.return_value = mock_board
+        figure_cache.clear()
+        expected_response = get_all_figures_in_board(mock_game_2, engine=FigureEngine.bitboard)
+        figure_cache.clear()
+        response = get_all_figures_in_board(mock_game_2, engine=FigureEngine.trie)
+
+        assert len(response) == 6
+        assert response == expected_response
+
+
+def test_figure_index_swap():
+    """
+    A swap only relabels the regions around the swapped tiles: the figure on the other side of the board is kept as is.
+    """
+    tile_colors = [Colors.red] * 36
+    for tile in (0, 1, 2, 3):
+        tile_colors[tile] = Colors.blue
+    for tile in (32, 33, 34, 35):
+        tile_colors[tile] = Colors.green
+
+    figure_index = FigureIndex()
+    figure_index.update(tile_colors)
+    kept_figure = figure_index.figures[tiles_to_mask((32, 33, 34, 35))]
+
+    assert figure_index.get_figures(Colors.none) == [(FigTypeAndDifficulty.FIGE_06, (0, 1, 2, 3)), (FigTypeAndDifficulty.FIGE_06, (32, 33, 34, 35))]
+
+    # Break the blue line in the top row
+    tile_colors[3], tile_colors[9] = tile_colors[9], tile_colors[3]
+    figure_index.update(tile_colors)
+
+    assert figure_index.figures[tiles_to_mask((32, 33, 34, 35))] is kept_figure
+    assert figure_index.get_figures(Colors.none) == [(FigTypeAndDifficulty.FIGE_06, (32, 33, 34, 35))]
+    assert figure_index.get_figures(Colors.green) == []
+
+
+def test_get_figures_in_boards_batch():
+    """
+    Batch detection over an (N, 6, 6) array of color codes, with one forbidden color per board.
+    """
+    red, blue, green = COLOR_CODES[Colors.red], COLOR_CODES[Colors.blue], COLOR_CODES[Colors.green]
+    boards = np.full((3, 6, 6), red, dtype=np.uint8)
+    boards[0, 0, 0:4] = blue
+    boards[1, 0, 0:4] = blue
+    boards[1, 5, 1:5] = green
+    boards[2, 0:5, 0] = blue
+
+    response = get_figures_in_boards(boards, [COLOR_CODES[Colors.none], blue, COLOR_CODES[Colors.none]])
+
+    assert response == [
+        [FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=0, y=y) for y in range(4)])],
+        [FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=5, y=y) for y in range(1, 5)])],
+        [FigureInBoardSchema(fig=FigTypeAndDifficulty.FIG_05, tiles=[Coordinate(x=x, y=0) for x in range(5)])],
+    ]
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.info() == {"hits": 2, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_figure_cache_hit():
+    """
+    The same board and forbidden color are only analysed once. A different forbidden color is another entry.
+    Every call gets its own copies of the figures.
+    """
+    board = MagicMock(spec=Board)
+    board.color_distribution = [[Colors.red] * 6 for _ in range(6)]
+    board.color_distribution[2][1:5] = [Colors.yellow] * 4
+    figure_cache.clear()
+
+    with patch('app.services.figure_services.get_figure_in_color_masks', wraps=get_figure_in_color_masks) as mock_get_figure:
+        first = get_figure_in_board(FigTypeAndDifficulty.FIGE_06.value, board, Colors.none)
+        first[0].tiles = set(first[0].tiles)
+        second = get_figure_in_board(FigTypeAndDifficulty.FIGE_06.value, board, Colors.none)
+        third = get_figure_in_board(FigTypeAndDifficulty.FIGE_06.value, board, Colors.yellow)
+
+        assert mock_get_figure.call_count == 2
+
+    assert second == [FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=2, y=y) for y in range(1, 5)])]
+    assert third == []
+    assert figure_cache.hits == 1
+    assert figure_cache.misses == 2
+
+
+def test_is_figure_isolated():
+    board = MagicMock(spec=Board)
+    board.color_distribution = [[Colors.red] * 6 for _ in range(6)]
+    board.color_distribution[0][0:4] = [Colors.blue] * 4
+    tiles = [Coordinate(x=0, y=y) for y in range(4)]
+
+    assert is_figure_isolated(tiles, board)
+
+    board.color_distribution[1][3] = Colors.blue
+    assert not is_figure_isolated(tiles, board)
+
+
+def test_get_figures_in_board_in_hand(mock_game_3):
+    """
+    Only the figure types in the players' hands are looked for. Cards out of the hands don't count.
+    """
+    mock_game_3.players = [
+        Player(id=1, name="Juan", figure_cards=[FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_06, in_hand=True),
+                                                 FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_01, in_hand=False)]),
+        Player(id=2, name="Pedro", figure_cards=[FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_02, in_hand=True),
+                                                  FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_06, in_hand=True)]),
+    ]
+    mock_board = MagicMock(spec=Board)
+    mock_board.color_distribution = [[Colors.green, Colors.red, Colors.red, Colors.blue, Colors.green, Colors.yellow],
+                  [Colors.green, Colors.red, Colors.red, Colors.blue, Colors.green, Colors.yellow],
+                  [Colors.green, Colors.yellow, Colors.yellow, Colors.green, Colors.green, Colors.yellow],
+                  [Colors.green, Colors.blue, Colors.yellow, Colors.yellow, Colors.red, Colors.red],
+                  [Colors.blue, Colors.blue, Colors.blue, Colors.green, Colors.green, Colors.red],
+                  [Colors.red, Colors.yellow, Colors.green, Colors.green, Colors.blue, Colors.red]]
+
+    fig_types = get_figure_types_in_hands(mock_game_3)
+    assert fig_types == [FigTypeAndDifficulty.FIGE_02, FigTypeAndDifficulty.FIGE_06]
+
+    with patch('app.services.figure_services.calculate_partial_board') as mock_calculate_partial_board:
+        mock_calculate_partial_board.return_value = mock_board
+        for engine in FigureEngine:
+            figure_cache.clear()
+            response = get_all_figures_in_board(mock_game_3, engine=engine, fig_types=fig_types)
+
+            assert [figure.fig for figure in response] == [FigTypeAndDifficulty.FIGE_02, FigTypeAndDifficulty.FIGE_06]
+
+
+def test_get_figure_at_tile():
+    """
+    Only the region of the clicked tile is checked against the requested figure.
+    """
+    board = MagicMock(spec=Board)
+    board.color_distribution = [[Colors.red] * 6 for _ in range(6)]
+    board.color_distribution[0][0:4] = [Colors.blue] * 4
+    board.color_distribution[3][3] = Colors.blue
+
+    expected_figure = FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=0, y=y) for y in range(4)])
+
+    assert get_figure_at_tile(FigTypeAndDifficulty.FIGE_06.value, board, 0, 2, Colors.none) == expected_figure
+    # Another figure type
+    assert get_figure_at_tile(FigTypeAndDifficulty.FIGE_05.value, board, 0, 2, Colors.none) is None
+    # The clicked tile is not part of the figure
+    assert get_figure_at_tile(FigTypeAndDifficulty.FIGE_06.value, board, 3, 3, Colors.none) is None
+    # The red region is too big to be a figure
+    assert get_figure_at_tile(FigTypeAndDifficulty.FIGE_06.value, board, 5, 5, Colors.none) is None
+    assert get_figure_at_tile(FigTypeAndDifficulty.FIGE_06.value, board, 0, 2, Colors.blue) is None
+
+
+def make_hint_board():
+    """Red and blue checkered board, with three green tiles at the top left and the fourth one a MOV_01 swap away"""
+    board = [[Colors.red if (x + y) % 2 == 0 else Colors.blue for y in range(6)] for x in range(6)]
+    board[0][0:3] = [Colors.green] * 3
+    board[2][1] = Colors.green
+    return BoardSchemaOut(color_distribution=board)
+
+
+def test_get_hint():
+    hint = get_hint(make_hint_board(), [MovementType.MOV_02, MovementType.MOV_01], [FigTypeAndDifficulty.FIGE_06], Colors.none)
+
+    assert hint.figure == FigureInBoardSchema(fig=FigTypeAndDifficulty.FIGE_06, tiles=[Coordinate(x=0, y=y) for y in range(4)])
+    assert [(movement.movement_type, movement.piece_1_coordinates, movement.piece_2_coordinates) for movement in hint.movements] == [
+        (MovementType.MOV_01, Coordinate(x=0, y=3), Coordinate(x=2, y=1))]
+    assert not hint.timed_out
+
+
+def test_get_hint_already_formed():
+    board = make_hint_board()
+    board.color_distribution[0][3], board.color_distribution[2][1] = Colors.green, Colors.blue
+
+    hint = get_hint(board, [MovementType.MOV_01], [FigTypeAndDifficulty.FIGE_06], Colors.none)
+
+    assert hint.figure.fig == FigTypeAndDifficulty.FIGE_06
+    assert hint.movements == []
+
+
+def test_get_hint_not_found():
+    # The green figure is forbidden
+    hint = get_hint(make_hint_board(), [MovementType.MOV_01], [FigTypeAndDifficulty.FIGE_06], Colors.green)
+    assert hint.figure is None and hint.movements == [] and not hint.timed_out
+
+    # No movement card reaches the fourth green tile
+    hint = get_hint(make_hint_board(), [MovementType.MOV_07], [FigTypeAndDifficulty.FIGE_06], Colors.none)
+    assert hint.figure is None and not hint.timed_out
+
+
+def test_get_hint_time_budget():
+    hint = get_hint(make_hint_board(), [MovementType.MOV_01], [FigTypeAndDifficulty.FIGE_06], Colors.none, time_budget=-1)
+
+    assert hint.figure is None
+    assert hint.timed_out
@@ -0,0 +1,255 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.db.db import Base, get_db, create_db_engine
+from app.db.enums import GameStatus, MovementType, FigTypeAndDifficulty
+from app.dependencies.dependencies import get_game
+from app.endpoints.game_endpoints import auth_scheme, game_connection_managers
+from app.models.game_models import Game
+from app.models.board_models import Board
+from app.models.player_models import Player
+from app.models.movement_model import Movement
+from app.models.movement_card_model import MovementCard
+from app.models.figure_card_model import FigureCard
+from app.services.game_services import convert_game_to_schema, calculate_partial_board, reload_game
+from app.services.figure_services import get_all_figures_in_board
+from app.services.websocket_services import GameManager
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import threading
+
+client = TestClient(app)
+
+
+def make_game(session_maker: sessionmaker, players: int) -> int:
+    """Game in course with its board, and players with cards in hand and one partial movement for the first one"""
+    db = session_maker()
+    game = Game(name="Game", player_amount=players, status=GameStatus.in_game, player_turn=0, host_id=1)
+    db.add(game)
+    db.commit()
+    db.add(Board(game.id))
+    for index in range(players):
+        player = Player(name=f"Player {index}", game_id=game.id, blocked=False)
+        player.movement_cards = [MovementCard(movement_type=MovementType.MOV_01, in_hand=index > 0),
+                                 MovementCard(movement_type=MovementType.MOV_01, in_hand=True),
+                                 MovementCard(movement_type=MovementType.MOV_02, in_hand=True)]
+        player.figure_cards = [FigureCard(type_and_difficulty=FigTypeAndDifficulty.FIGE_01, in_hand=True)
+                               for _ in range(3)]
+        db.add(player)
+    db.commit()
+    db.add(Movement(player_id=1, movement_type=MovementType.MOV_01, final_movement=False, x1=0, y1=0, x2=2, y2=2))
+    db.commit()
+    game_id = game.id
+    db.close()
+    return game_id
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_db_engine(url=f"sqlite:///{tmp_path / 'switcher.db'}")
+    Base.metadata.create_all(bind=engine)
+
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine), queries
+    engine.dispose()
+
+
+@pytest.mark.parametrize("players", [2, 4])
+def test_reload_game_loads_the_aggregate(database, players):
+    session_maker, queries = database
+    game_id = make_game(session_maker, players)
+
+    with session_maker() as db:
+        queries.clear()
+        game = reload_game(get_game(game_id, db))
+        convert_game_to_schema(game)
+        calculate_partial_board(game)
+
+        # The game checked by the dependency, then game and board, players, and their movement cards,
+        # figure cards and movements
+        assert len(queries) == 6
+
+
+def test_lazy_load_audit(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+
+    with patch("app.services.game_services.LAZY_LOAD_AUDIT", True), session_maker() as db:
+        game = reload_game(get_game(game_id, db))
+        convert_game_to_schema(game)
+
+        # Relationships outside of the aggregate can't be lazy loaded
+        with pytest.raises(InvalidRequestError):
+            game.players[0].game
+
+
+def test_hot_endpoints_without_lazy_loads(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+    # Like the bearer token lookup, the player comes from another session
+    with session_maker() as auth_db:
+        player = auth_db.get(Player, 1)
+    db = session_maker()
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[auth_scheme] = lambda: player
+
+    with patch("app.services.game_services.LAZY_LOAD_AUDIT", True), \
+         patch.dict(game_connection_managers, {game_id: GameManager()}):
+        response = client.put(f"/games/{game_id}/movement/add", json={
+            "movement_card": {"movement_type": MovementType.MOV_02.value, "associated_player": 1, "in_hand": True},
+            "piece_1_coordinates": {"x": 0, "y": 0}, "piece_2_coordinates": {"x": 0, "y": 2}})
+        assert response.status_code == 200
+
+        response = client.put(f"/games/{game_id}/movement/back")
+        assert response.status_code == 204
+
+        response = client.get(f"/games/{game_id}/movement/preview")
+        assert response.status_code == 200
+
+        response = client.get(f"/games/{game_id}/movement/legal")
+        assert response.status_code == 200
+
+        response = client.put(f"/games/{game_id}/finish-turn")
+        assert response.status_code == 200
+
+        # The views the broadcasts send, from a game loaded again after the turn
+        with session_maker() as view_db:
+            game = reload_game(get_game(game_id, view_db))
+            convert_game_to_schema(game)
+            calculate_partial_board(game)
+
+    db.close()
+    app.dependency_overrides = {}
+
+
+def test_hot_endpoints_commit_once(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+    with session_maker() as auth_db:
+        player = auth_db.get(Player, 1)
+    db = session_maker()
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[auth_scheme] = lambda: player
+
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(session))
+
+    with patch.dict(game_connection_managers, {game_id: GameManager()}):
+        for method, url, body in [
+            ("put", "movement/add", {"movement_card": {"movement_type": MovementType.MOV_02.value,
+                                                       "associated_player": 1, "in_hand": True},
+                                     "piece_1_coordinates": {"x": 0, "y": 0}, "piece_2_coordinates": {"x": 0, "y": 2}}),
+            ("put", "movement/back", None),
+            ("put", "finish-turn", None),
+        ]:
+            commits.clear()
+            response = client.request(method, f"/games/{game_id}/{url}", json=body)
+            assert response.status_code in (200, 204)
+            assert len(commits) == 1
+
+    # The game the endpoint kept in memory after the commit is the one in the database
+    game_out = response.json()["game"]
+    with session_maker() as view_db:
+        assert convert_game_to_schema(reload_game(get_game(game_id, view_db))).model_dump(mode="json") == game_out
+    assert game_out["player_turn"] == 1
+    assert all(len(player["figure_cards"]) == 3 for player in game_out["players"])
+
+    db.close()
+    app.dependency_overrides = {}
+
+
+def test_concurrent_movements_with_one_card(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+    with session_maker() as auth_db:
+        player = auth_db.get(Player, 1)
+
+    def get_test_db():
+        with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[auth_scheme] = lambda: player
+    movement = {"movement_card": {"movement_type": MovementType.MOV_02.value, "associated_player": 1, "in_hand": True},
+                "piece_1_coordinates": {"x": 0, "y": 0}, "piece_2_coordinates": {"x": 0, "y": 2}}
+
+    # The player holds a single MOV_02 card, so only one of the requests can use it
+    with TestClient(app) as loop_client, patch.dict(game_connection_managers, {game_id: GameManager()}), \
+            ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(
+            lambda _: loop_client.put(f"/games/{game_id}/movement/add", json=movement), range(4)))
+
+    assert sorted(response.status_code for response in responses) == [200, 400, 400, 400]
+    with session_maker() as db:
+        assert db.query(Movement).filter(Movement.player_id == 1, Movement.final_movement == False).count() == 2
+
+    app.dependency_overrides = {}
+
+
+def test_broadcast_views_built_in_the_executor(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+    with session_maker() as auth_db:
+        player = auth_db.get(Player, 1)
+
+    def get_test_db():
+        with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[auth_scheme] = lambda: player
+    movement = {"movement_card": {"movement_type": MovementType.MOV_02.value, "associated_player": 1, "in_hand": True},
+                "piece_1_coordinates": {"x": 0, "y": 0}, "piece_2_coordinates": {"x": 0, "y": 2}}
+
+    threads = []
+
+    def record_thread(function):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return function(*args, **kwargs)
+        return wrapper
+
+    # The event loop only sends the events, the boards, figures and games are built by the work in the executor
+    with TestClient(app) as loop_client, patch.dict(game_connection_managers, {game_id: GameManager()}), \
+            patch("app.services.websocket_services.calculate_partial_board", record_thread(calculate_partial_board)), \
+            patch("app.services.websocket_services.get_all_figures_in_board",
+                  record_thread(get_all_figures_in_board)), \
+            patch("app.services.websocket_services.convert_game_to_schema", record_thread(convert_game_to_schema)):
+        response = loop_client.put(f"/games/{game_id}/movement/add", json=movement)
+
+    assert response.status_code == 200
+    assert len(threads) == 3
+    assert all(name.startswith("game-executor") for name in threads)
+
+    app.dependency_overrides = {}
+
+
+def test_websocket_loads_the_game_in_the_executor(database):
+    session_maker, _ = database
+    game_id = make_game(session_maker, 2)
+
+    def get_test_db():
+        with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    threads = []
+
+    def record_reload(game):
+        threads.append(threading.current_thread().name)
+        return reload_game(game)
+
+    with patch("app.endpoints.websocket_endpoints.reload_game", record_reload), \
+            patch.dict(game_connection_managers, {}), \
+            client.websocket_connect(f"/ws/games/{game_id}") as websocket:
+        event = websocket.receive_json()
+
+    assert [player["name"] for player in event["payload"]["players"]] == ["Player 0", "Player 1"]
+    assert len(threads) == 1 and threads[0].startswith("game-executor")
+
+    app.dependency_overrides = {}
@@ -1,5 +1,6 @@
 from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
 import pytest
 from app.main import app
 from app.db.db import get_db
@@ -18,6 +19,7 @@ from app.endpoints.game_endpoints import auth_scheme
 from app.services.game_services import initialize_figure_decks, erase_figure_card, has_figure_card
 from app.endpoints.game_endpoints import discard_figure_card
 from app.services.movement_services import delete_movement_cards_not_in_hand
+from app.schemas.board_schemas import BoardSchemaOut
 
 
 client = TestClient(app)
@@ -38,6 +40,8 @@ def mock_db_config(mock_db):
     mock_player.token = "123456789"
 
     def add_side_effect(game):
+        # Valores que asigna la base de datos al hacer commit
+        game.id = mock_game.id
         game.status = mock_game.status
         game.player_turn = mock_game.player_turn
 
@@ -196,12 +200,6 @@ def test_join_game():
         app.dependency_overrides[get_game] = lambda: mock_game
         app.dependency_overrides[auth_scheme] = lambda: mock_player
 
-        def add_player():
-            mock_game.players.append(mock_player)
-            mock_player.game_id = mock_game.id
-
-        mock_db.commit.side_effect = add_player
-
         mock_db.merge.return_value = mock_player
 
         # Make the PUT request using the test client
@@ -327,6 +325,36 @@ def test_quit_game():
     app.dependency_overrides = {}
 
 
+def test_quit_game_commit_fails():
+    with patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager:
+        mock_db = MagicMock()
+
+        mock_list_players = [
+            Player(id=1, name="Juan", blocked=False),
+            Player(id=2, name="Pedro", blocked=False)
+        ]
+
+        mock_game = Game(id=1, name="gametest", player_amount=2, status=GameStatus.in_game,
+                         host_id=2, player_turn=0, players=mock_list_players, forbidden_color=Colors.none)
+
+        mock_player = mock_list_players[0]
+        mock_db.merge.return_value = mock_player
+        mock_db.commit.side_effect = OperationalError("COMMIT", {}, Exception("database is locked"))
+
+        app.dependency_overrides[get_db] = lambda: mock_db
+        app.dependency_overrides[get_game] = lambda: mock_game
+        app.dependency_overrides[auth_scheme] = lambda: mock_player
+
+        with pytest.raises(OperationalError):
+            client.put("/games/1/quit")
+
+        # Nada se anuncia si la partida no se guardo
+        mock_manager[mock_game.id].broadcast_disconnection.assert_not_called()
+        mock_manager[mock_game.id].broadcast_game_won.assert_not_called()
+
+    app.dependency_overrides = {}
+
+
 def test_quit_game_host_cannot_leave():
     # Crear la sesión de base de datos mock
     mock_db = MagicMock()
@@ -415,7 +443,7 @@ def test_get_games_waiting():
     mock_player = Player(id=1, name="Juan", blocked=False)
 
     # Configurar el mock para que filtre por estado "waiting"
-    mock_db.query.return_value.filter.return_value.all.return_value = [
+    mock_db.query.return_value.options.return_value.filter.return_value.all.return_value = [
         mock_games[0]
     ]
 
@@ -458,7 +486,7 @@ def test_get_all_games():
     mock_player = Player(id=1, name="Juan", blocked=False)
 
     # Configurar el mock para que devuelva todas las partidas
-    mock_db.query.return_value.all.return_value = mock_games
+    mock_db.query.return_value.options.return_value.all.return_value = mock_games
 
     # Sobrescribir la dependencia de get_db con la sesión mock
     app.dependency_overrides[get_db] = lambda: mock_db
@@ -501,7 +529,7 @@ def test_get_games_invalid_status():
     mock_db = MagicMock()
 
     # Configurar el mock para que no devuelva ninguna partida
-    mock_db.query.return_value.filter.return_value.all.return_value = []
+    mock_db.query.return_value.options.return_value.filter.return_value.all.return_value = []
 
     mock_player = Player(id=1, name="Juan", blocked=False)
 
@@ -859,11 +887,10 @@ def unitest_test_delete_movement_cards_not_in_hand():
     # Verificar que se haya eliminado la carta de movimiento que no estaba en mano
     mock_db.delete.assert_called_with(movement_card_not_in_hand)
 
-    # Verificar que el commit se haya llamado después de eliminar
-    mock_db.commit.assert_called_once()
+    assert player.movement_cards == [movement_card_in_hand]
 
-    # Verificar que se haya refrescado el jugador después de la eliminación
-    mock_db.refresh.assert_called_once_with(player)
+    # El commit lo hace el endpoint
+    mock_db.commit.assert_not_called()
 
 
 def unitest_test_erase_figure_card():
@@ -979,13 +1006,13 @@ def test_discard_figure_card():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
             patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase, \
             patch("app.endpoints.game_endpoints.serialize_board") as mock_serialize_board:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
         mock_serialize_board.return_value = [
             ["red"]]  # Mock the serialized board
@@ -1049,12 +1076,12 @@ def test_discard_figure_card_victory():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
         patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
 
         def side_effect(player, figure, db):
@@ -1083,6 +1110,54 @@ def test_discard_figure_card_victory():
         mock_manager[mock_game.id].broadcast_game_won.assert_called_once()
 
 
+def test_discard_figure_card_not_at_clicked_tile():
+    """
+    The figure is in the board, but the clicked tile is not part of it.
+    """
+    mock_db = MagicMock()
+
+    mock_figure_card = [FigureCard(
+        id=1, type_and_difficulty=FigTypeAndDifficulty.FIGE_06, associated_player=3, in_hand=True)]
+
+    mock_board = MagicMock()
+    mock_board.color_distribution = [[Colors.red] * 6 for _ in range(6)]
+    mock_board.color_distribution[0][0:4] = [Colors.blue] * 4
+    mock_board.color_distribution[3][3] = Colors.blue
+
+    mock_list_players = [
+        Player(id=1, name="Juan"),
+        Player(id=2, name="Pedro"),
+        Player(id=3, name="Maria", figure_cards=mock_figure_card)
+    ]
+
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3,
+                     name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=2, forbidden_color=Colors.none)
+
+    mock_game.board = mock_board
+
+    ugly_figure_data = FigureToDiscardSchema(
+        figure_card=FigTypeAndDifficulty.FIGE_06.value[0], associated_player=3, figure_board=FigTypeAndDifficulty.FIGE_06.value[0], clicked_x=3, clicked_y=3)
+
+    app.dependency_overrides[get_db] = lambda: mock_db
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
+
+    with patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
+            patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
+            patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
+
+        mock_calculate_partial_board.return_value = mock_board
+
+        response = client.put("/games/1/figure/discard",
+                              json=ugly_figure_data.model_dump())
+
+        assert response.status_code == 403
+        assert response.json() == {
+            "detail": "La carta figura no esta formada en el tablero"}
+        mock_erase.assert_not_called()
+        assert mock_game.forbidden_color == Colors.none
+
+
 def test_discard_figure_card_blocked():
     mock_db = MagicMock()
     mock_db.add.return_value = None
@@ -1121,12 +1196,12 @@ def test_discard_figure_card_blocked():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
         patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
 
         mock_erase.return_value = None
@@ -1176,12 +1251,12 @@ def test_unlock_and_discard_figure_card():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[0]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
         patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
 
         mock_erase.return_value = None
@@ -1241,12 +1316,12 @@ def test_discard_figure_card_when_other_equal_figure_is_in_hand():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[0]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
         patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
 
         mock_erase.return_value = None
@@ -1304,12 +1379,12 @@ def test_discard_non_blocked_user_and_blocked_card():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
         patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch("app.endpoints.game_endpoints.erase_figure_card") as mock_erase:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
 
         mock_erase.return_value = None
@@ -1752,13 +1827,13 @@ def test_block_figure_card():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
             patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch('app.endpoints.game_endpoints.next', return_value=mock_figure_card[0]), \
             patch("app.endpoints.game_endpoints.serialize_board") as mock_serialize_board:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
         mock_serialize_board.return_value = [
             ["red"]]  # Mock the serialized board
@@ -1824,13 +1899,13 @@ def test_block_figure_card_already_blocked():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
             patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch('app.endpoints.game_endpoints.next', return_value=mock_figure_card[0]), \
             patch("app.endpoints.game_endpoints.serialize_board") as mock_serialize_board:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
         mock_serialize_board.return_value = [
             ["red"]]  # Mock the serialized board
@@ -1891,13 +1966,13 @@ def test_block_figure_card_one_card():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
             patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch('app.endpoints.game_endpoints.next', return_value=mock_figure_card[0]), \
             patch("app.endpoints.game_endpoints.serialize_board") as mock_serialize_board:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
         mock_serialize_board.return_value = [
             ["red"]]  # Mock the serialized board
@@ -1960,13 +2035,13 @@ def test_block_figure_card_forbidden_color():
     app.dependency_overrides[get_game] = lambda: mock_game
     app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
 
-    with patch('app.endpoints.game_endpoints.get_figure_in_board') as mock_get_figure_in_board, \
+    with patch('app.endpoints.game_endpoints.get_figure_at_tile') as mock_get_figure_at_tile, \
             patch('app.endpoints.game_endpoints.calculate_partial_board') as mock_calculate_partial_board, \
             patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager, \
             patch('app.endpoints.game_endpoints.next', return_value=mock_figure_card[0]), \
             patch("app.endpoints.game_endpoints.serialize_board") as mock_serialize_board:
 
-        mock_get_figure_in_board.return_value = [real_figure_in_board]
+        mock_get_figure_at_tile.return_value = real_figure_in_board
         mock_calculate_partial_board.return_value = mock_board
         mock_serialize_board.return_value = [
             ["red"]]  # Mock the serialized board
@@ -1985,3 +2060,65 @@ def test_block_figure_card_forbidden_color():
         assert response.status_code == 403
         assert response.json() == {
             "detail": "El color de la figura no puede ser el color prohibido"}
+
+
+def test_get_figure_hint():
+    mock_figure_cards = [
+        FigureCard(id=1, type_and_difficulty=FigTypeAndDifficulty.FIGE_06, associated_player=3, in_hand=True, blocked=False),
+        FigureCard(id=2, type_and_difficulty=FigTypeAndDifficulty.FIG_01, associated_player=3, in_hand=False, blocked=False),
+    ]
+    mock_movement_cards = [
+        MovementCard(id=1, movement_type=MovementType.MOV_01, associated_player=3, in_hand=True),
+    ]
+
+    mock_list_players = [
+        Player(id=1, name="Juan"),
+        Player(id=2, name="Pedro"),
+        Player(id=3, name="Maria", figure_cards=mock_figure_cards, movement_cards=mock_movement_cards)
+    ]
+
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1",
+                     status=GameStatus.in_game, host_id=1, player_turn=2, forbidden_color=Colors.none)
+
+    board = [[Colors.red if (x + y) % 2 == 0 else Colors.blue for y in range(6)] for x in range(6)]
+    board[0][0:3] = [Colors.green] * 3
+    board[2][1] = Colors.green
+
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
+
+    with patch("app.endpoints.game_endpoints.calculate_partial_board") as mock_calculate_partial_board:
+        mock_calculate_partial_board.return_value = BoardSchemaOut(color_distribution=board)
+
+        response = client.get("/games/1/hint")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "figure": {"fig": list(FigTypeAndDifficulty.FIGE_06.value), "tiles": [{"x": 0, "y": y} for y in range(4)]},
+        "movements": [{"movement_type": MovementType.MOV_01.value,
+                       "piece_1_coordinates": {"x": 0, "y": 3}, "piece_2_coordinates": {"x": 2, "y": 1}}],
+        "timed_out": False
+    }
+
+    app.dependency_overrides = {}
+
+
+def test_get_figure_hint_player_not_turn_fail():
+    mock_list_players = [
+        Player(id=1, name="Juan"),
+        Player(id=2, name="Pedro"),
+        Player(id=3, name="Maria")
+    ]
+
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1",
+                     status=GameStatus.in_game, host_id=1, player_turn=2)
+
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[1]
+
+    response = client.get("/games/1/hint")
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Es necesario que sea tu turno para pedir una pista"}
+
+    app.dependency_overrides = {}
@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker
+from app.db.db import Base
+from app.db.enums import GameStatus, Colors
+from app.models.game_models import Game
+from app.models.board_models import Board
+from app.models.player_models import Player
+from app.services.game_services import convert_game_to_schema
+from app.services.memo_services import memoized_view, get_view_memo
+import pytest
+
+
+@pytest.fixture
+def db():
+    # The game list listeners read the new game from another thread
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def game(db):
+    game = Game(name="Game 1", player_amount=2, status=GameStatus.waiting, forbidden_color=Colors.none, player_turn=0,
+                host_id=1)
+    game.players.append(Player(name="Juan", blocked=False))
+    db.add(game)
+    db.commit()
+    return game
+
+
+def test_view_shared_until_commit(db, game):
+    first = convert_game_to_schema(game)
+    assert convert_game_to_schema(game) is first
+
+    game.players.append(Player(name="Pedro", blocked=False))
+    db.commit()
+
+    second = convert_game_to_schema(game)
+    assert second is not first
+    assert [player.name for player in second.players] == ["Juan", "Pedro"]
+
+
+def test_view_memo_cleared_on_flush_and_rollback(db, game):
+    calls = []
+
+    @memoized_view
+    def view(game, *fig_types):
+        calls.append(fig_types)
+        return len(calls)
+
+    assert view(game, ["fig01"]) == view(game, ["fig01"]) == 1
+    assert view(game, ["fig02"]) == 2
+
+    game.forbidden_color = Colors.red
+    db.flush()
+    assert view(game, ["fig01"]) == 3
+
+    db.rollback()
+    assert view(game, ["fig01"]) == 4
+
+
+def test_view_memo_cleared_on_change(db, game):
+    first = convert_game_to_schema(game)
+
+    # Nothing is flushed until the endpoint commits, the views read after a change must see it
+    game.forbidden_color = Colors.red
+    second = convert_game_to_schema(game)
+    assert second is not first
+    assert second.forbidden_color == Colors.red
+
+    game.players[0].blocked = True
+    assert convert_game_to_schema(game).players[0].blocked
+
+    game.players.remove(game.players[0])
+    assert convert_game_to_schema(game).players == []
+
+
+def test_view_without_session():
+    assert get_view_memo(Game(id=1)) is None
+    assert get_view_memo(MagicMock(spec=Game)) is None
+    assert get_view_memo(MagicMock()) is None
@@ -11,6 +11,15 @@ from app.endpoints.game_endpoints import auth_scheme
 from app.schemas.movement_schema import MovementSchema, Coordinate
 from app.schemas.movement_cards_schema import MovementCardSchema
 from app.models.movement_model import Movement
+from app.db.enums import Colors, FigTypeAndDifficulty
+from app.db.constants import VALID_MOVES
+from app.schemas.board_schemas import BoardSchemaOut
+from app.services.bitboard_services import get_color_masks
+from app.services.component_services import get_figures_in_components
+from app.services.preview_services import get_swap_previews, swap_preview_cache
+from app.services.movement_services import validate_movement
+from fastapi import HTTPException
+import random
 
 client = TestClient(app)
 
@@ -1271,3 +1280,148 @@ def test_add_movement_mov01_with_validmov02_fail():
         assert response.status_code == 400
         
     app.dependency_overrides = {}
+
+# ------------------------------------------------- TESTS ABOUT MOVEMENT PREVIEW ---------------------------------------------------------
+
+def make_checkered_board():
+    """Red and blue checkered board, with a line of four green tiles at the top left"""
+    board = [[Colors.red if (x + y) % 2 == 0 else Colors.blue for y in range(6)] for x in range(6)]
+    board[0][0:4] = [Colors.green] * 4
+    return BoardSchemaOut(color_distribution=board)
+
+
+def test_preview_movements():
+    mock_movement_cards = [
+        MovementCard(id=1, movement_type=MovementType.MOV_01, associated_player=3, in_hand=True),
+        MovementCard(id=2, movement_type=MovementType.MOV_01, associated_player=3, in_hand=True),
+        MovementCard(id=3, movement_type=MovementType.MOV_02, associated_player=3, in_hand=False),
+    ]
+
+    mock_list_players = [
+        Player(id=1, name="Juan"),
+        Player(id=2, name="Pedro"),
+        Player(id=3, name="Maria", movement_cards=mock_movement_cards)
+    ]
+
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=2,
+                     forbidden_color=Colors.none)
+
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[2]
+
+    with patch("app.endpoints.game_endpoints.calculate_partial_board") as mock_calculate_partial_board:
+        mock_calculate_partial_board.return_value = make_checkered_board()
+        swap_preview_cache.clear()
+
+        response = client.get("/games/1/movement/preview")
+
+    assert response.status_code == 200
+    previews = response.json()
+    # Only the MOV_01 card is in hand, and each swap is listed once
+    assert len(previews) == len(VALID_MOVES["MOV_01"]) // 2
+    assert all(preview["movement_type"] == MovementType.MOV_01.value for preview in previews)
+
+    preview = next(preview for preview in previews
+                   if preview["piece_1_coordinates"] == {"x": 0, "y": 3} and preview["piece_2_coordinates"] == {"x": 2, "y": 1})
+    assert preview["formed_figures"] == []
+    assert preview["destroyed_figures"] == [{"fig": list(FigTypeAndDifficulty.FIGE_06.value),
+                                             "tiles": [{"x": 0, "y": y} for y in range(4)]}]
+
+    app.dependency_overrides = {}
+
+
+def test_preview_movements_player_not_turn_fail():
+    mock_list_players = [
+        Player(id=1, name="Juan"),
+        Player(id=2, name="Pedro"),
+        Player(id=3, name="Maria")
+    ]
+
+    mock_game = Game(id=1, players=mock_list_players, player_amount=3, name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=2)
+
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[0]
+
+    response = client.get("/games/1/movement/preview")
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Es necesario que sea tu turno para poder realizar un movimiento"}
+
+    app.dependency_overrides = {}
+
+
+def test_get_swap_previews_matches_full_detection():
+    """
+    The figures formed and destroyed by every swap are the difference between detecting the figures
+    in the board before and after it.
+    """
+    rng = random.Random(12)
+    for _ in range(3):
+        colors = [Colors.red] * 9 + [Colors.blue] * 9 + [Colors.yellow] * 9 + [Colors.green] * 9
+        rng.shuffle(colors)
+        board = BoardSchemaOut(color_distribution=[colors[i:i + 6] for i in range(0, 36, 6)])
+        before = set(get_figures_in_components(get_color_masks(board), Colors.red))
+
+        swap_preview_cache.clear()
+        for preview in get_swap_previews(board, list(MovementType), Colors.red):
+            swapped = [row[:] for row in board.color_distribution]
+            x1, y1 = preview.piece_1_coordinates.x, preview.piece_1_coordinates.y
+            x2, y2 = preview.piece_2_coordinates.x, preview.piece_2_coordinates.y
+            swapped[x1][y1], swapped[x2][y2] = swapped[x2][y2], swapped[x1][y1]
+            after = set(get_figures_in_components(get_color_masks(BoardSchemaOut(color_distribution=swapped)), Colors.red))
+
+            assert {(figure.fig, tuple(tile.x * 6 + tile.y for tile in figure.tiles)) for figure in preview.formed_figures} == after - before
+            assert {(figure.fig, tuple(tile.x * 6 + tile.y for tile in figure.tiles)) for figure in preview.destroyed_figures} == before - after
+
+# ------------------------------------------------- TESTS ABOUT LEGAL MOVEMENTS ---------------------------------------------------------
+
+def test_move_targets_match_valid_moves():
+    tiles = [(x, y) for x in range(6) for y in range(6)]
+    for movement_type in MovementType:
+        for x1, y1 in tiles:
+            for x2, y2 in tiles:
+                movement = MovementSchema(
+                    movement_card=MovementCardSchema(movement_type=movement_type, associated_player=1, in_hand=True),
+                    piece_1_coordinates=Coordinate(x=x1, y=y1), piece_2_coordinates=Coordinate(x=x2, y=y2))
+                try:
+                    validate_movement(movement, MagicMock())
+                    valid = True
+                except HTTPException:
+                    valid = False
+                assert valid == ((x1, y1, x2, y2) in VALID_MOVES[movement_type.name])
+
+
+def test_get_legal_movements():
+    mock_movement_cards = [
+        MovementCard(id=1, movement_type=MovementType.MOV_01, associated_player=1, in_hand=True),
+        MovementCard(id=2, movement_type=MovementType.MOV_03, associated_player=1, in_hand=True),
+        MovementCard(id=3, movement_type=MovementType.MOV_02, associated_player=1, in_hand=False),
+    ]
+    mock_list_players = [Player(id=1, name="Juan", movement_cards=mock_movement_cards), Player(id=2, name="Pedro")]
+    mock_game = Game(id=1, players=mock_list_players, player_amount=2, name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=1)
+
+    app.dependency_overrides[get_game] = lambda: mock_game
+    app.dependency_overrides[auth_scheme] = lambda: mock_list_players[0]
+
+    response = client.get("/games/1/movement/legal")
+
+    assert response.status_code == 200
+    legal_movements = response.json()
+    assert {movement["movement_type"] for movement in legal_movements} == {MovementType.MOV_01.value, MovementType.MOV_03.value}
+    assert sum(len(movement["targets"]) for movement in legal_movements) == len(VALID_MOVES["MOV_01"]) + len(VALID_MOVES["MOV_03"])
+
+    response = client.get("/games/1/movement/legal", params={"x": 0, "y": 0})
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"movement_type": MovementType.MOV_01.value, "piece_1_coordinates": {"x": 0, "y": 0}, "targets": [{"x": 2, "y": 2}]},
+        {"movement_type": MovementType.MOV_03.value, "piece_1_coordinates": {"x": 0, "y": 0},
+         "targets": [{"x": 0, "y": 1}, {"x": 1, "y": 0}]},
+    ]
+
+    response = client.get("/games/1/movement/legal", params={"x": 0})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Es necesario indicar ambas coordenadas de la ficha"}
+
+    app.dependency_overrides = {}
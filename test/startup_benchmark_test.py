@@ -0,0 +1,66 @@
+"""
+Startup benchmark.
+
+Every uvicorn worker and test process imports app.main, and with it app.db.constants, which compiles the move and
+figure tables once when it is imported. Each measure runs in a new interpreter, so nothing is shared between them.
+
+Run it as a script to print the import times of the constants and of the whole app:
+    PYTHONPATH=. python test/startup_benchmark_test.py
+"""
+from typing import Dict
+import os
+import subprocess
+import sys
+
+STARTUP_REPEATS = 5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds to import the module
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Times the tables are compiled while importing the module
+TABLE_BUILDS_SCRIPT = """
+import sys
+builds = []
+sys.setprofile(lambda frame, event, arg: event == "call" and frame.f_code.co_name == "compile_tables"
+               and builds.append(frame))
+import {module}
+sys.setprofile(None)
+print(len(builds))
+"""
+
+
+def run_script(script: str, module: str) -> str:
+    output = subprocess.run([sys.executable, "-c", script.format(module=module)], env=dict(os.environ, PYTHONPATH=ROOT),
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1]
+
+
+def measure_import(module: str, repeats: int = STARTUP_REPEATS) -> float:
+    """Fastest of repeats imports of the module, each one in a new interpreter"""
+    return min(float(run_script(IMPORT_SCRIPT, module)) for _ in range(repeats))
+
+
+def count_table_builds(module: str) -> int:
+    return int(run_script(TABLE_BUILDS_SCRIPT, module))
+
+
+def run_benchmark(repeats: int = STARTUP_REPEATS) -> Dict[str, float]:
+    return {
+        "app.db.constants": measure_import("app.db.constants", repeats=repeats),
+        "app.main": measure_import("app.main", repeats=repeats),
+    }
+
+
+def test_tables_are_compiled_once_per_process():
+    assert count_table_builds("app.main") == 1
+
+
+if __name__ == "__main__":
+    for name, value in run_benchmark().items():
+        print(f"{name:45} {value * 1000:10.1f} ms")
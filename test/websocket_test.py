@@ -14,7 +14,7 @@ from app.endpoints.websocket_endpoints import game_list_manager
 from app.services.game_services import convert_game_to_schema
 from app.services.websocket_services import ConnectionManager, GameManager
 from app.models.board_models import Board
-from app.db.enums import Colors
+from app.db.enums import Colors, FigTypeAndDifficulty
 from app.schemas.board_schemas import BoardSchemaOut
 
 
@@ -60,7 +60,7 @@ async def test_connect_game_list(mock_websocket, mock_game):
     Test to see if the connect method is adding the websocket to the active connections list.
     """
     mock_db = MagicMock()
-    mock_db.query.return_value.filter.return_value.all.return_value = [
+    mock_db.query.return_value.options.return_value.filter.return_value.all.return_value = [
         mock_game]
 
     expected_payload = [convert_game_to_schema(mock_game)]
@@ -460,6 +460,29 @@ async def test_broadcast_board(mock_websocket, mock_game):
             "color_distribution"] == mock_board.color_distribution
 
 
+@pytest.mark.asyncio
+async def test_broadcast_board_compact(mock_websocket, mock_game):
+    mock_websocket2 = MagicMock(spec=WebSocket)
+    game_connection_manager = GameManager()
+    mock_board = MagicMock(spec=Board)
+    mock_board.color_distribution = [[Colors.red.value, Colors.blue.value, Colors.yellow.value,
+                                      Colors.green.value, Colors.red.value, Colors.blue.value] for _ in range(6)]
+    mock_game.board = mock_board
+
+    with patch.object(mock_websocket, "send_json") as mock_send_json, patch.object(mock_websocket2, "send_json") as mock_send_json2:
+        await game_connection_manager.connect(websocket=mock_websocket, compact=True)
+        await game_connection_manager.connect(websocket=mock_websocket2)
+        await game_connection_manager.broadcast_board(mock_game)
+
+        assert mock_send_json.call_args_list[0][0][0] == {"type": "board", "message": "",
+                                                          "payload": {"packed": "rbygrb" * 6}}
+        assert mock_send_json2.call_args_list[0][0][0]["payload"][
+            "color_distribution"] == mock_board.color_distribution
+
+    game_connection_manager.disconnect(mock_websocket)
+    assert mock_websocket not in game_connection_manager.connection_manager.compact_connections
+
+
 @pytest.mark.asyncio
 async def test_broadcast_partial_board(mock_websocket):
     with patch("app.endpoints.game_endpoints.game_connection_managers") as mock_manager:
@@ -543,4 +566,26 @@ async def test_broadcast_figures_in_board(mock_websocket):
 
                 assert sent_value["type"] == "figures"
                 assert sent_value["message"] == ""
-                assert sent_value["payload"] == figures
\ No newline at end of file
+                assert sent_value["payload"] == figures
+
+
+@pytest.mark.asyncio
+async def test_broadcast_figures_in_board_in_hand(mock_websocket):
+    """
+    When only the figures in hand are looked for, the event says which types were scanned.
+    """
+    game_connection_manager = GameManager()
+    mock_game = Game(id=1, players=[], player_amount=3,
+                     name="Game 1", status=GameStatus.in_game, host_id=1, player_turn=2)
+
+    with patch("app.services.websocket_services.get_figure_types_to_scan", return_value=[FigTypeAndDifficulty.FIG_01, FigTypeAndDifficulty.FIGE_02]), \
+            patch("app.services.websocket_services.get_all_figures_in_board", return_value=[]) as mock_get_figures, \
+            patch.object(mock_websocket, "send_json") as mock_send_json:
+        await game_connection_manager.connect(websocket=mock_websocket)
+        await game_connection_manager.broadcast_figures_in_board(mock_game)
+
+        sent_value = mock_send_json.call_args_list[0][0][0]
+
+        mock_get_figures.assert_called_once_with(mock_game, fig_types=[FigTypeAndDifficulty.FIG_01, FigTypeAndDifficulty.FIGE_02])
+        assert sent_value["payload"] == []
+        assert sent_value["scanned"] == ["fig01", "fige02"]